@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable, Iterable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    thread-safe LRU cache with per-entry expiry and tag based invalidation
+    (an entry is dropped when any of its tags is invalidated)
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any, tuple]] = OrderedDict()
+        self._tags: dict[Hashable, set] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable, default=None, count: bool = True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        value,
+        tags: Iterable[Hashable] = (),
+        ttl: float | None = None,
+    ) -> None:
+        tags = tuple(tags)
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def values(self) -> list:
+        """snapshot of the stored values, expired ones included"""
+        with self._lock:
+            return [value for _, value, _ in self._data.values()]
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate(self, *tags: Hashable) -> int:
+        """drops every entry carrying one of `tags`, returns how many"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class GuardedTTLCache(TTLCache):
+    """
+    `TTLCache` whose `generation` changes on every invalidation, so a value
+    computed while a write landed is dropped by `set_if_current` instead of
+    being stored stale
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        self.generation = 0
+        self._generation_lock = Lock()
+
+    def invalidate(self, *tags: Hashable) -> int:
+        with self._generation_lock:
+            self.generation += 1
+        return super().invalidate(*tags)
+
+    def clear(self) -> None:
+        with self._generation_lock:
+            self.generation += 1
+        super().clear()
+
+    def set_if_current(
+        self, generation: int, key: Hashable, value, tags: Iterable[Hashable] = ()
+    ) -> bool:
+        # held while storing, so an invalidation either skips it or drops it
+        with self._generation_lock:
+            if generation != self.generation:
+                return False
+            self.set(key, value, tags)
+            return True
@@ -0,0 +1,251 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+import os
+import sys
+
+from playhouse.signals import post_save, post_delete
+
+from app.cache import TTLCache
+from app.literals import BRANCHES, CITIES
+from app.models.dbmodel import (
+    CatalogueVersion,
+    Guide,
+    JobCategory,
+    Personality,
+    Seeker,
+    database_proxy,
+    m2m_changed,
+)
+from app.models.prefetch import prefetch_schema
+from app.models.schemas import BranchInfo, JobCategorySchema
+from app.models.serializers import dumps
+
+# how often workers compare their snapshot with the database's version
+CATALOGUE_CHECK_INTERVAL = int(os.environ.get("CATALOGUE_CHECK_INTERVAL", 5))
+SEEKER_PERSONALITY_CACHE_SIZE = int(
+    os.environ.get("SEEKER_PERSONALITY_CACHE_SIZE", 10000)
+)
+# bounds how long a seeker's personalities changed in another worker are stale
+SEEKER_PERSONALITY_CACHE_TTL = int(os.environ.get("SEEKER_PERSONALITY_CACHE_TTL", 60))
+
+logger = getLogger("API")
+
+# seeker id -> personality slugs, dropped on writes to them in this worker
+seeker_personalities = TTLCache(
+    SEEKER_PERSONALITY_CACHE_SIZE, SEEKER_PERSONALITY_CACHE_TTL
+)
+
+# the literals are code, their bodies are built once
+CITIES_BODY = dumps(CITIES)
+BRANCHES_BODY = dumps([BranchInfo(**b) for b in BRANCHES])
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    database: object
+    categories: dict[str, JobCategory]
+    # rendered `JobCategorySchema`, guides included
+    category_bodies: dict[str, bytes]
+    personalities: dict[str, Personality]
+    # personality slug -> sorted category slugs
+    personality_categories: dict[str, tuple[str, ...]]
+    loaded_on: datetime = field(default_factory=datetime.now)
+    load_seconds: float = 0.0
+    size: int = 0
+
+
+def current_version() -> int:
+    row = CatalogueVersion.get_or_none(CatalogueVersion.id == 1)
+    return row.version if row else 0
+
+
+def bump_version() -> None:
+    if not (
+        CatalogueVersion.update(version=CatalogueVersion.version + 1)
+        .where(CatalogueVersion.id == 1)
+        .execute()
+    ):
+        CatalogueVersion.insert(id=1, version=1).on_conflict_ignore().execute()
+
+
+def deep_size(obj, seen: set = None) -> int:
+    """approximate bytes held by `obj` and what it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__data__"):
+        size += deep_size(obj.__data__, seen)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def personality_categories() -> dict[str, tuple[str, ...]]:
+    CategoryPersonality = Personality.job_categories.get_through_model()
+    groups = defaultdict(list)
+    for personality, category in (
+        CategoryPersonality.select(
+            CategoryPersonality.personality, CategoryPersonality.jobcategory
+        )
+        .order_by(CategoryPersonality.jobcategory)
+        .tuples()
+    ):
+        groups[personality].append(category)
+    return {personality: tuple(slugs) for personality, slugs in groups.items()}
+
+
+def load() -> Snapshot:
+    start = perf_counter()
+    # read first: a write during the load bumps past it, so it's reloaded
+    version = current_version()
+    categories = {
+        c.slug: c for c in prefetch_schema(JobCategory.select(), JobCategorySchema)
+    }
+    tables = dict(
+        categories=categories,
+        category_bodies={
+            slug: dumps(c.to_schema(JobCategorySchema))
+            for slug, c in categories.items()
+        },
+        personalities={p.slug: p for p in Personality.select()},
+        personality_categories=personality_categories(),
+    )
+    return Snapshot(
+        version=version,
+        database=database_proxy.obj,
+        load_seconds=perf_counter() - start,
+        size=deep_size(tables),
+        **tables,
+    )
+
+
+class Catalogue:
+    """
+    in-process snapshot of the rarely changing catalogue tables. writes in
+    this worker mark it stale right away, other workers notice the bumped
+    `CatalogueVersion` within `CATALOGUE_CHECK_INTERVAL` seconds.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._snapshot: Snapshot | None = None
+        self._stale = True
+
+    def _current(self) -> Snapshot | None:
+        snapshot = self._snapshot
+        if self._stale or snapshot is None:
+            return None
+        # e.g. tests switching databases
+        if snapshot.database is not database_proxy.obj:
+            return None
+        return snapshot
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._current() or self.reload(force=False)
+
+    def reload(self, force: bool = True) -> Snapshot:
+        with self._lock:
+            if not force and (snapshot := self._current()) is not None:
+                # another thread reloaded meanwhile
+                return snapshot
+            # cleared first, so a write during the load marks it again
+            self._stale = False
+            try:
+                snapshot = load()
+            except Exception:
+                self._stale = True
+                raise
+            self._snapshot = snapshot
+        logger.info(
+            f"catalogue v{snapshot.version}: {len(snapshot.categories)} "
+            f"categories, {len(snapshot.personalities)} personalities loaded in "
+            f"{snapshot.load_seconds * 1000:.1f}ms, ~{snapshot.size // 1024} KiB"
+        )
+        return snapshot
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def check(self) -> None:
+        """reloads when another worker changed the catalogue"""
+        if self._snapshot is None or current_version() != self._snapshot.version:
+            self.reload()
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "stale": self._stale,
+            "version": snapshot.version,
+            "loaded_on": snapshot.loaded_on.isoformat(),
+            "load_ms": round(snapshot.load_seconds * 1000, 1),
+            "bytes": snapshot.size,
+            "categories": len(snapshot.categories),
+            "personalities": len(snapshot.personalities),
+        }
+
+
+catalogue = Catalogue()
+
+
+def personalities_of(seeker_id: int) -> frozenset[str]:
+    personalities = seeker_personalities.get(seeker_id)
+    if personalities is None:
+        SeekerPersonality = Personality.seekers.get_through_model()
+        personalities = frozenset(
+            slug
+            for (slug,) in SeekerPersonality.select(SeekerPersonality.personality)
+            .where(SeekerPersonality.seeker == seeker_id)
+            .tuples()
+        )
+        seeker_personalities.set(seeker_id, personalities)
+    return personalities
+
+
+def suited_categories(personality: str, seeker_id: int) -> tuple[str, ...] | None:
+    """
+    the category slugs of `personality` when the seeker has it, for an `IN`
+    list or an intersection; None when the search isn't narrowed
+    """
+    if personality not in personalities_of(seeker_id):
+        return None
+    return catalogue.snapshot.personality_categories.get(personality, ())
+
+
+@post_save(sender=JobCategory)
+@post_delete(sender=JobCategory)
+@post_save(sender=Guide)
+@post_delete(sender=Guide)
+@post_save(sender=Personality)
+@post_delete(sender=Personality)
+def _catalogue_changed(sender, instance, *args, **kwargs):
+    bump_version()
+    catalogue.mark_stale()
+
+
+@m2m_changed(sender=Personality)
+@m2m_changed(sender=JobCategory)
+@m2m_changed(sender=Seeker)
+def _personalities_changed(sender, instance, field, *args, **kwargs):
+    if field.through_model is Personality.job_categories.through_model:
+        bump_version()
+        catalogue.mark_stale()
+    elif isinstance(instance, Seeker):
+        seeker_personalities.delete(instance.id)
+    else:
+        # a personality's seekers, rare enough to drop them all
+        seeker_personalities.clear()
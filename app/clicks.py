@@ -0,0 +1,70 @@
+from collections import Counter, defaultdict
+from threading import Lock
+import os
+
+from playhouse.signals import post_save, post_delete
+
+from app.cache import TTLCache
+from app.models.dbmodel import Course, database_proxy
+
+CLICK_FLUSH_INTERVAL = int(os.environ.get("CLICK_FLUSH_INTERVAL", 10))  # seconds
+COURSE_LINK_CACHE_SIZE = int(os.environ.get("COURSE_LINK_CACHE_SIZE", 5000))
+COURSE_LINK_CACHE_TTL = int(os.environ.get("COURSE_LINK_CACHE_TTL", 3600))
+
+# slug -> link, dropped on course writes
+course_links = TTLCache(COURSE_LINK_CACHE_SIZE, COURSE_LINK_CACHE_TTL)
+
+
+class ClickCounter:
+    """
+    clicks counted in memory and written as batched `clicks = clicks + n`
+    updates, so a redirect never waits on the database's write lock. clicks
+    of a worker that dies between flushes are lost.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._pending: Counter[str] = Counter()
+        self.flushed = 0
+
+    def add(self, slug: str, count: int = 1) -> None:
+        with self._lock:
+            self._pending[slug] += count
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self) -> int:
+        """writes the pending clicks in one transaction, returns how many"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        # one UPDATE per distinct increment rather than per course
+        by_count = defaultdict(list)
+        for slug, count in pending.items():
+            by_count[count].append(slug)
+        try:
+            with database_proxy.atomic():
+                for count, slugs in by_count.items():
+                    Course.update(clicks=Course.clicks + count).where(
+                        Course.slug.in_(slugs)
+                    ).execute()
+        except Exception:
+            # kept for the next flush
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        total = sum(pending.values())
+        self.flushed += total
+        return total
+
+
+click_counter = ClickCounter()
+
+
+@post_save(sender=Course)
+@post_delete(sender=Course)
+def _forget_course(sender, instance, *args, **kwargs):
+    course_links.delete(instance.slug)
@@ -4,8 +4,10 @@ from fastapi import Depends, HTTPException, status, Security, Body, Header
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from peewee import DoesNotExist
+from peewee import DoesNotExist, JOIN
+from playhouse.signals import post_save, post_delete
 from enum import Enum
+import os
 from app.models.schemas import SudoToken
 
 from app.utils import (
@@ -17,7 +19,9 @@ from app.utils import (
     RefreshTokenData,
     SudoTokenData,
 )
-from app.models.dbmodel import User
+from app.models.dbmodel import User, Seeker, Employer
+from app.database import AsyncDatabase, async_db
+from app.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/login",
@@ -43,6 +47,82 @@ optional_oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
+def get_db() -> AsyncDatabase:
+    return async_db
+
+
+AsyncDB = Annotated[AsyncDatabase, Depends(get_db)]
+
+
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10_000))
+# other workers only notice a password/role change after this many seconds
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 60))
+
+# token signature -> (signed part, AccessTokenData, user row, profile rows)
+auth_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def load_user(user_id: str) -> User:
+    return (
+        User.select(User, Seeker, Employer)
+        .join(Seeker, JOIN.LEFT_OUTER)
+        .switch(User)
+        .join(Employer, JOIN.LEFT_OUTER)
+        .where(User.id == user_id)
+        .get()
+    )
+
+
+def _restore(model, data: dict, rel: dict):
+    obj = model(**data)
+    for name, (rel_model, rel_data) in rel.items():
+        obj.__rel__[name] = _restore(rel_model, rel_data, {})
+    obj._dirty.clear()
+    return obj
+
+
+async def resolve_token(token: str, db: AsyncDatabase) -> tuple[AccessTokenData, User]:
+    """
+    verifies an access token and loads its user (with seeker/employer),
+    answering repeated tokens from `auth_cache` without touching the database
+    """
+    signed, _, signature = token.rpartition(".")
+    cached = auth_cache.get(signature)
+    if cached is None or cached[0] != signed:
+        token_data = AccessTokenData(
+            **jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
+        )
+        user = await db.run(load_user, token_data.id)
+        rel = {
+            name: (type(obj), dict(obj.__data__))
+            for name, obj in user.__rel__.items()
+        }
+        cached = (signed, token_data, dict(user.__data__), rel)
+        tags = [f"user:{user.id}"]
+        tags += [f"{name}:{obj.id}" for name, obj in user.__rel__.items()]
+        auth_cache.set(signature, cached, tags)
+    _, token_data, user_data, rel = cached
+    return token_data, _restore(User, user_data, rel)
+
+
+@post_save(sender=User)
+@post_delete(sender=User)
+def _forget_user(sender, instance, *args, **kwargs):
+    auth_cache.invalidate(f"user:{instance.id}")
+
+
+@post_save(sender=Seeker)
+@post_delete(sender=Seeker)
+def _forget_seeker(sender, instance, *args, **kwargs):
+    auth_cache.invalidate(f"seeker:{instance.id}")
+
+
+@post_save(sender=Employer)
+@post_delete(sender=Employer)
+def _forget_employer(sender, instance, *args, **kwargs):
+    auth_cache.invalidate(f"employer:{instance.id}")
+
+
 class Scopes(list, Enum):
     me = ["me"]
     employer = ["employer"]
@@ -51,7 +131,9 @@ class Scopes(list, Enum):
 
 
 async def get_current_user(
-    security_scopes: SecurityScopes, token: Annotated[str, Depends(oauth2_scheme)]
+    security_scopes: SecurityScopes,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncDB,
 ):
     if security_scopes.scopes:
         authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
@@ -64,10 +146,8 @@ async def get_current_user(
         headers={"WWW-Authenticate": authenticate_value},
     )
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-        token_data = AccessTokenData(**payload)
+        token_data, user = await resolve_token(token, db)
         timezone = token_data.exp.tzinfo
-        user = User.get_by_id(token_data.id)
         if user.pass_hash != token_data.pass_hash or token_data.exp < datetime.now(
             timezone
         ):
@@ -90,17 +170,19 @@ class get_user_or_none:
     def __init__(self, scopes: list | None = None):
         self.scopes = scopes
 
-    def __call__(self, token: Annotated[str, Depends(optional_oauth2_scheme)] = None):
+    async def __call__(
+        self,
+        db: AsyncDB,
+        token: Annotated[str, Depends(optional_oauth2_scheme)] = None,
+    ):
         if not token:
             return None
 
         try:
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-            token_data = AccessTokenData(**payload)
+            token_data, user = await resolve_token(token, db)
             timezone = token_data.exp.tzinfo
-            if datetime.fromtimestamp(token_data.exp) < datetime.now(timezone):
+            if token_data.exp < datetime.now(timezone):
                 return None
-            user = User.get_by_id(token_data.id)
             if user.disabled:
                 return None
             if self.scopes:
@@ -113,7 +195,9 @@ class get_user_or_none:
 
 
 async def decode_refresh_token(
-    token: Annotated[str, Body()], refresh_token: Annotated[str, Body()]
+    token: Annotated[str, Body()],
+    refresh_token: Annotated[str, Body()],
+    db: AsyncDB,
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -128,7 +212,7 @@ async def decode_refresh_token(
         )
         timezone = token_data.exp.tzinfo
         if token_data.id == refresh_token_data.id:
-            user = User.get_by_id(token_data.id)
+            user = await db.run(User.get_by_id, token_data.id)
         else:
             raise credentials_exception
         if (
@@ -0,0 +1,121 @@
+from datetime import datetime
+from enum import Enum
+from io import StringIO
+from typing import AsyncIterator, Iterable, Iterator
+import csv
+import os
+import weakref
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+import orjson
+
+from app.database import AsyncDatabase
+from app.models.schemas import ExportFormat
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 500))
+# each running export holds a database worker for its whole duration
+EXPORT_CONCURRENCY = int(os.environ.get("EXPORT_CONCURRENCY", 2))
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+_running = 0
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def ndjson_chunks(rows: Iterable[dict], chunk_rows: int = EXPORT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(orjson.dumps(row))
+        if len(chunk) == chunk_rows:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+def csv_chunks(
+    rows: Iterable[dict], columns: list[str], chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # the BOM makes spreadsheet apps read Persian text as UTF-8
+    yield ("\ufeff" + buffer.getvalue()).encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_cell(row[column]) for column in columns])
+        if i % chunk_rows == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def chunks(rows: Iterable[dict], columns: list[str], format: ExportFormat):
+    if format == ExportFormat.csv:
+        return csv_chunks(rows, columns)
+    return ndjson_chunks(rows)
+
+
+def _release() -> None:
+    global _running
+    _running -= 1
+
+
+class _Counted:
+    """
+    iterates `body` holding an export slot, given back once when the body
+    ends, fails or is closed, or when the response is dropped unsent
+    """
+
+    def __init__(self, body: AsyncIterator[bytes]) -> None:
+        self.body = body
+        self.release = weakref.finalize(self, _release)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            return await self.body.__anext__()
+        except BaseException:
+            # StopAsyncIteration too
+            self.release()
+            raise
+
+    async def aclose(self) -> None:
+        self.release()
+        await self.body.aclose()
+
+
+def export_response(
+    db: AsyncDatabase, func, *args, format: ExportFormat, filename: str
+) -> StreamingResponse:
+    """
+    streams the chunks `func(*args)` yields on a database worker; rows are
+    never collected, so memory stays flat whatever the row count
+    """
+    global _running
+    if _running >= EXPORT_CONCURRENCY:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "export.busy")
+    _running += 1
+    return StreamingResponse(
+        _Counted(db.stream(func, *args)),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{format.value}"'
+        },
+    )
@@ -0,0 +1,281 @@
+from collections import defaultdict
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from threading import Lock
+from time import monotonic
+import os
+
+from playhouse.signals import post_save, post_delete
+
+from app.models.dbmodel import Employer, Job, Skill, database_proxy, m2m_changed
+from app.models.schemas import SalaryRange
+
+FACETS_REFRESH = int(os.environ.get("FACETS_REFRESH", 300))  # seconds
+FACET_LIMIT = 20  # values returned per facet
+FACETS = ("city", "category", "skill", "type", "salary")
+
+# [low, high) of `Job.max_salary`, jobs without a salary are "agreement"
+SALARY_RANGES: dict[SalaryRange, tuple[int, int | None]] = {
+    SalaryRange.lt10m: (1, 10_000_000),
+    SalaryRange.m10_20: (10_000_000, 20_000_000),
+    SalaryRange.m20_40: (20_000_000, 40_000_000),
+    SalaryRange.gt40m: (40_000_000, None),
+}
+
+
+def salary_range(min_salary: int, max_salary: int) -> SalaryRange:
+    if not min_salary or not max_salary:
+        return SalaryRange.agreement
+    for key, (low, high) in SALARY_RANGES.items():
+        if max_salary >= low and (high is None or max_salary < high):
+            return key
+    return SalaryRange.agreement
+
+
+def salary_condition(ranges: list[SalaryRange]):
+    """the SQL side of `salary_range`"""
+    conditions = []
+    for key in ranges:
+        if key == SalaryRange.agreement:
+            conditions.append((Job.min_salary == 0) | (Job.max_salary == 0))
+            continue
+        low, high = SALARY_RANGES[key]
+        condition = (Job.min_salary != 0) & (Job.max_salary >= low)
+        if high is not None:
+            condition &= Job.max_salary < high
+        conditions.append(condition)
+    result = conditions[0]
+    for condition in conditions[1:]:
+        result |= condition
+    return result
+
+
+def bitmap(ids) -> int:
+    """int with the bits of `ids` set, in one pass instead of an OR per id"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for id in ids:
+        data[id >> 3] |= 1 << (id & 7)
+    return int.from_bytes(data, "little")
+
+
+class FacetIndex:
+    """
+    a bitmap (python int, bit = job id) of active jobs per facet value, so
+    the counts of any filter combination are popcounts instead of a GROUP BY
+    per facet over the catalogue.
+
+    built at startup, rebuilt from the database every `FACETS_REFRESH`
+    seconds and patched in between by signals on `Job` and `Employer`. the
+    signals only reach the worker that wrote, so other workers' counts are
+    approximate until their next rebuild.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.built_on: float | None = None
+        self.active = 0
+        self.bitmaps: dict[str, dict[str, int]] = {facet: {} for facet in FACETS}
+        # job id -> (facet values, expire_on), to clear its bits on change
+        self.jobs: dict[int, tuple[dict[str, tuple], datetime]] = {}
+        self.expiry: list[tuple[datetime, int]] = []
+
+    @staticmethod
+    def _load(*where) -> dict[int, tuple[dict[str, tuple], datetime]]:
+        JobSkill = Job.skills.get_through_model()
+        rows = (
+            Job.select(
+                Job.id,
+                Job.category,
+                Job.type,
+                Job.min_salary,
+                Job.max_salary,
+                Job.expire_on,
+                Employer.city,
+            )
+            .join(Employer)
+            .where(Job.active(), *where)
+        )
+        jobs, skills = {}, defaultdict(list)
+        # raw rows, peewee's per-row strptime is most of a rebuild's time
+        for id, category, type, min_salary, max_salary, expire_on, city in (
+            database_proxy.execute(rows)
+        ):
+            if isinstance(expire_on, str):
+                expire_on = datetime.fromisoformat(expire_on)
+            jobs[id] = (
+                dict(
+                    city=(city,),
+                    category=(category,) if category else (),
+                    type=(type,),
+                    salary=(salary_range(min_salary, max_salary).value,),
+                ),
+                expire_on,
+            )
+        for job_id, skill in (
+            JobSkill.select(JobSkill.job, JobSkill.skill)
+            .join(Job)
+            .where(Job.active(), *where)
+            .tuples()
+        ):
+            skills[job_id].append(skill)
+        for id, (values, _) in jobs.items():
+            values["skill"] = tuple(skills[id])
+        return jobs
+
+    def _add(self, job_id: int, values: dict[str, tuple], expire_on) -> None:
+        bit = 1 << job_id
+        for facet, facet_values in values.items():
+            bitmaps = self.bitmaps[facet]
+            for value in facet_values:
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+        self.active |= bit
+        self.jobs[job_id] = (values, expire_on)
+        heappush(self.expiry, (expire_on, job_id))
+
+    def _remove(self, job_id: int) -> None:
+        entry = self.jobs.pop(job_id, None)
+        if entry is None:
+            return
+        mask = ~(1 << job_id)
+        for facet, facet_values in entry[0].items():
+            bitmaps = self.bitmaps[facet]
+            for value in facet_values:
+                bitmaps[value] &= mask
+        self.active &= mask
+
+    def _expire(self, now: datetime) -> None:
+        while self.expiry and self.expiry[0][0] <= now:
+            expire_on, job_id = heappop(self.expiry)
+            entry = self.jobs.get(job_id)
+            # stale heap entries of updated jobs are skipped
+            if entry is not None and entry[1] == expire_on:
+                self._remove(job_id)
+
+    def rebuild(self) -> int:
+        """reloads every active job, returns how many"""
+        jobs = self._load()
+        ids = {facet: defaultdict(list) for facet in FACETS}
+        for job_id, (values, _) in jobs.items():
+            for facet, facet_values in values.items():
+                for value in facet_values:
+                    ids[facet][value].append(job_id)
+        bitmaps = {
+            facet: {value: bitmap(v) for value, v in values.items()}
+            for facet, values in ids.items()
+        }
+        expiry = [(expire_on, job_id) for job_id, (_, expire_on) in jobs.items()]
+        heapify(expiry)
+        active = bitmap(jobs)
+        with self._lock:
+            self.active, self.bitmaps = active, bitmaps
+            self.jobs, self.expiry = jobs, expiry
+            self.built_on = monotonic()
+        return len(jobs)
+
+    def refresh_jobs(self, ids: list[int]) -> None:
+        if self.built_on is None or not ids:
+            return
+        jobs = self._load(Job.id.in_(ids))
+        with self._lock:
+            for job_id in ids:
+                self._remove(job_id)
+                if job_id in jobs:
+                    self._add(job_id, *jobs[job_id])
+
+    def remove_jobs(self, ids: list[int]) -> None:
+        with self._lock:
+            for job_id in ids:
+                self._remove(job_id)
+
+    def value_bitmaps(self, facet: str, values) -> dict[str, int]:
+        """the bitmap of active jobs of each of `values`"""
+        with self._lock:
+            self._expire(datetime.now())
+            bitmaps = self.bitmaps[facet]
+            return {value: bitmaps.get(value, 0) for value in values}
+
+    def job_values(self, ids) -> dict[int, dict[str, tuple]]:
+        with self._lock:
+            return {id: self.jobs[id][0] for id in ids if id in self.jobs}
+
+    def counts(
+        self, filters: dict[str, list[str]], limit: int = FACET_LIMIT
+    ) -> tuple[int, dict[str, list[tuple[str, int]]]]:
+        """
+        total of the jobs matching `filters` and, per facet, the most common
+        values among the jobs matching the *other* filters (so selecting a
+        city still shows how many jobs the other cities have)
+        """
+        with self._lock:
+            self._expire(datetime.now())
+            selected = {}
+            for facet, values in filters.items():
+                if values:
+                    bitmaps = self.bitmaps[facet]
+                    bits = 0
+                    for value in values:
+                        bits |= bitmaps.get(value, 0)
+                    selected[facet] = bits
+            total = self.active
+            for bits in selected.values():
+                total &= bits
+            facets = {}
+            for facet in FACETS:
+                base = self.active
+                for other, bits in selected.items():
+                    if other != facet:
+                        base &= bits
+                counts = [
+                    (value, (base & bits).bit_count())
+                    for value, bits in self.bitmaps[facet].items()
+                ]
+                counts = sorted(
+                    (c for c in counts if c[1] or c[0] in filters.get(facet, ())),
+                    key=lambda c: (-c[1], c[0]),
+                )
+                facets[facet] = counts[:limit]
+        return total.bit_count(), facets
+
+
+facet_index = FacetIndex()
+
+
+@post_save(sender=Job)
+def _refresh_job(sender, instance, *args, **kwargs):
+    facet_index.refresh_jobs([instance.id])
+
+
+@post_delete(sender=Job)
+def _remove_job(sender, instance, *args, **kwargs):
+    facet_index.remove_jobs([instance.id])
+
+
+@post_save(sender=Employer)
+def _refresh_employer(sender, instance, *args, **kwargs):
+    if facet_index.built_on is not None:
+        facet_index.refresh_jobs(
+            [job.id for job in Job.select(Job.id).where(Job.employer == instance)]
+        )
+
+
+@m2m_changed(sender=Job)
+def _refresh_job_skills(sender, instance, *args, **kwargs):
+    facet_index.refresh_jobs([instance.id])
+
+
+# jobs a skill was removed from keep it until the next rebuild
+@m2m_changed(sender=Skill)
+def _refresh_skill_jobs(sender, instance, *args, **kwargs):
+    if facet_index.built_on is not None:
+        JobSkill = Job.skills.get_through_model()
+        facet_index.refresh_jobs(
+            [
+                job_id
+                for (job_id,) in JobSkill.select(JobSkill.job)
+                .where(JobSkill.skill == instance)
+                .tuples()
+            ]
+        )
@@ -0,0 +1,52 @@
+import os
+
+from playhouse.signals import post_save, post_delete
+
+from app.cache import GuardedTTLCache
+from app.models.dbmodel import Course, Exam, Guide, JobCategory, Skill, SkillTimeline
+
+GUIDE_CACHE_SIZE = int(os.environ.get("GUIDE_CACHE_SIZE", 1000))
+# bounds how long other workers serve a guide changed elsewhere
+GUIDE_CACHE_TTL = int(os.environ.get("GUIDE_CACHE_TTL", 300))  # seconds
+
+
+def guide_tags(guide: Guide) -> list[str]:
+    tags = [f"guide:{guide.slug}", f"category:{guide.category_id}"]
+    return tags + [f"skill:{step.skill_id}" for step in guide.roadmap]
+
+
+# rendered `GuideSchema` bytes per slug
+guide_bodies = GuardedTTLCache(GUIDE_CACHE_SIZE, GUIDE_CACHE_TTL)
+
+
+# a guide shows up in its category's guide list on every sibling's page
+@post_save(sender=Guide)
+@post_delete(sender=Guide)
+def _forget_guides(sender, instance, *args, **kwargs):
+    guide_bodies.clear()
+
+
+@post_save(sender=SkillTimeline)
+@post_delete(sender=SkillTimeline)
+def _forget_roadmap(sender, instance, *args, **kwargs):
+    guide_bodies.invalidate(f"guide:{instance.guide_id}")
+
+
+@post_save(sender=JobCategory)
+@post_delete(sender=JobCategory)
+def _forget_guide_category(sender, instance, *args, **kwargs):
+    guide_bodies.invalidate(f"category:{instance.slug}")
+
+
+@post_save(sender=Skill)
+@post_delete(sender=Skill)
+def _forget_guide_skill(sender, instance, *args, **kwargs):
+    guide_bodies.invalidate(f"skill:{instance.slug}")
+
+
+@post_save(sender=Course)
+@post_delete(sender=Course)
+@post_save(sender=Exam)
+@post_delete(sender=Exam)
+def _forget_skill_parts(sender, instance, *args, **kwargs):
+    guide_bodies.invalidate(f"skill:{instance.skill_id}")
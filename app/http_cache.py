@@ -0,0 +1,194 @@
+from dataclasses import dataclass
+from hashlib import blake2b
+from urllib.parse import urlencode
+from fastapi import Request, Response, status
+from playhouse.signals import post_save, post_delete
+import asyncio
+import os
+import re
+import redis.asyncio as redis
+
+from app.cache import TTLCache
+from app.models.dbmodel import (
+    Course,
+    Exam,
+    Guide,
+    Job,
+    JobCategory,
+    Skill,
+    SkillTimeline,
+    m2m_changed,
+)
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 2000))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 30))  # seconds
+# e.g. redis://localhost/1, shares cached pages between workers when set
+RESPONSE_CACHE_REDIS = os.environ.get("RESPONSE_CACHE_REDIS")
+REDIS_PREFIX = "pisheh:resp:"
+
+# anonymous GET routes served from the cache -> tags of the rows they render
+CACHED_ROUTES: list[tuple[re.Pattern, tuple[str, ...]]] = [
+    (re.compile(r"^/jobs/$"), ("job", "category")),
+    (re.compile(r"^/jobs/search$"), ("job", "category")),
+    (re.compile(r"^/jobs/filter$"), ("job", "category")),
+    # categories with their guides, before the `/category/{slug}` pattern
+    (re.compile(r"^/category/search$"), ("category", "guide")),
+    (re.compile(r"^/category/(?!search$)[^/]+$"), ("category", "guide")),
+    (re.compile(r"^/guidances/search/[1-4]$"), ("category", "guide")),
+    (re.compile(r"^/guidances/[^/]+$"), ("guide", "category")),
+]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+
+    def dumps(self) -> bytes:
+        return f"{self.etag}\n{self.media_type}\n".encode() + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CachedResponse":
+        etag, media_type, body = data.split(b"\n", 2)
+        return cls(body, etag.decode(), media_type.decode())
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ResponseCache:
+    """
+    rendered responses in a local LRU and, optionally, in Redis. writes to
+    the tagged tables invalidate both; other workers' local copies live at
+    most `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, redis_url: str = None) -> None:
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.redis = redis.from_url(redis_url) if redis_url else None
+        self.redis_hits = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def get(self, key: str) -> CachedResponse | None:
+        self._loop = asyncio.get_running_loop()
+        entry = self.local.get(key)
+        if entry is None and self.redis is not None:
+            data = await self.redis.get(REDIS_PREFIX + key)
+            if data is not None:
+                self.redis_hits += 1
+                entry = CachedResponse.loads(data)
+        return entry
+
+    async def set(self, key: str, entry: CachedResponse, tags) -> None:
+        self.local.set(key, entry, tags)
+        if self.redis is not None:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(REDIS_PREFIX + key, entry.dumps(), ex=self.ttl)
+                for tag in tags:
+                    pipe.sadd(f"{REDIS_PREFIX}tag:{tag}", key)
+                    pipe.expire(f"{REDIS_PREFIX}tag:{tag}", self.ttl)
+                await pipe.execute()
+
+    async def _invalidate_redis(self, tags) -> None:
+        for tag in tags:
+            tag_key = f"{REDIS_PREFIX}tag:{tag}"
+            keys = await self.redis.smembers(tag_key)
+            keys = [REDIS_PREFIX.encode() + key for key in keys]
+            await self.redis.delete(tag_key, *keys)
+
+    def invalidate(self, *tags: str) -> None:
+        """safe to call from database worker threads"""
+        self.local.invalidate(*tags)
+        if self.redis is not None and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._invalidate_redis(tags), self._loop)
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "bytes": sum(len(entry.body) for entry in self.local.values()),
+            "redis": self.redis is not None,
+            "redis_hits": self.redis_hits,
+        }
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_REDIS
+)
+
+
+def cached_route(request: Request) -> tuple[str, ...] | None:
+    if request.method != "GET" or "authorization" in request.headers:
+        return None
+    for pattern, tags in CACHED_ROUTES:
+        if pattern.match(request.url.path):
+            return tags
+    return None
+
+
+def cache_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in if_none_match.replace(" ", "").split(",")
+
+
+async def cache_responses(request: Request, call_next):
+    tags = cached_route(request)
+    if tags is None:
+        return await call_next(request)
+    key = cache_key(request)
+    entry = await response_cache.get(key)
+    state = "HIT"
+    if entry is None:
+        response = await call_next(request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = CachedResponse(
+            body, make_etag(body), response.headers.get("content-type")
+        )
+        await response_cache.set(key, entry, tags)
+        state = "MISS"
+    headers = {"ETag": entry.etag, "X-Cache": state}
+    if not_modified(request, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+
+@post_save(sender=Job)
+@post_delete(sender=Job)
+@m2m_changed(sender=Job)
+@m2m_changed(sender=Skill)
+def _forget_job(sender, instance, *args, **kwargs):
+    response_cache.invalidate("job")
+
+
+@post_save(sender=JobCategory)
+@post_delete(sender=JobCategory)
+def _forget_category(sender, instance, *args, **kwargs):
+    response_cache.invalidate("category")
+
+
+@post_save(sender=Guide)
+@post_delete(sender=Guide)
+def _forget_guide(sender, instance, *args, **kwargs):
+    response_cache.invalidate("guide")
+
+
+# parts of a guide's roadmap
+@post_save(sender=SkillTimeline)
+@post_delete(sender=SkillTimeline)
+@post_save(sender=Skill)
+@post_delete(sender=Skill)
+@post_save(sender=Course)
+@post_delete(sender=Course)
+@post_save(sender=Exam)
+@post_delete(sender=Exam)
+def _forget_guide_parts(sender, instance, *args, **kwargs):
+    response_cache.invalidate("guide")
@@ -0,0 +1,206 @@
+from datetime import datetime
+from logging import getLogger
+from playhouse.signals import post_save, post_delete
+from pydantic import ValidationError
+import orjson
+
+from app.models.dbmodel import (
+    DoesNotExist,
+    JOIN,
+    Employer,
+    Guide,
+    Job,
+    JobCategory,
+    JobListing,
+    Skill,
+    User,
+    database_proxy,
+    m2m_changed,
+    time_ago,
+)
+from app.models.prefetch import prefetch_schema
+from app.models.schemas import JobSchema
+from app.models.serializers import dumps
+
+REBUILD_BATCH_SIZE = 1000
+
+logger = getLogger("API")
+
+
+def _document(job: Job) -> str:
+    document = orjson.loads(dumps(job.to_schema(JobSchema)))
+    document["timedelta"] = None
+    return orjson.dumps(document).decode()
+
+
+def render(row: JobListing) -> dict:
+    """the stored document as `JobSchema` renders it, `timedelta` as of now"""
+    document = orjson.loads(row.document)
+    document["timedelta"] = time_ago(row.created_on)
+    return document
+
+
+def _rows(jobs: list[Job]) -> list[dict]:
+    rows = []
+    for job in jobs:
+        try:
+            document = _document(job)
+        except (DoesNotExist, ValidationError) as e:
+            # e.g. an employer without an account yet, listed once it has one
+            logger.warning(f"job {job.id} not listed: {e!r}")
+            continue
+        rows.append(
+            dict(
+                job=job.id,
+                category=job.category_id,
+                created_on=job.created_on,
+                expire_on=job.expire_on,
+                document=document,
+            )
+        )
+    return rows
+
+
+def _live_jobs(ids: list[int]) -> list[Job]:
+    return prefetch_schema(
+        Job.select().where(Job.id.in_(ids), Job.active()), JobSchema
+    )
+
+
+def refresh_jobs(ids: list[int]) -> None:
+    """re-renders the listing rows of `ids`, dropping inactive or deleted jobs"""
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        batch = ids[start : start + REBUILD_BATCH_SIZE]
+        with database_proxy.atomic():
+            rows = _rows(_live_jobs(batch))
+            JobListing.delete().where(JobListing.job.in_(batch)).execute()
+            if rows:
+                JobListing.insert_many(rows).execute()
+
+
+def unlist_jobs(ids: list[int]) -> None:
+    JobListing.delete().where(JobListing.job.in_(ids)).execute()
+
+
+def rebuild_listing(batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """re-renders every active job, returns how many were listed"""
+    JobListing.delete().execute()
+    total = last_id = 0
+    while True:
+        with database_proxy.atomic():
+            jobs = prefetch_schema(
+                Job.select()
+                .where(Job.id > last_id, Job.active())
+                .order_by(Job.id)
+                .limit(batch_size),
+                JobSchema,
+            )
+            if not jobs:
+                break
+            rows = _rows(jobs)
+            if rows:
+                JobListing.insert_many(rows).execute()
+        total += len(rows)
+        last_id = jobs[-1].id
+    return total
+
+
+def check_listing(batch_size: int = REBUILD_BATCH_SIZE) -> list[tuple[int, str]]:
+    """
+    diffs the read model against documents rendered from live joins, returns
+    (job id, "missing" | "stale" | "orphan") of every mismatch
+    """
+    problems = []
+    now = datetime.now()
+    last_id = 0
+    while True:
+        jobs = prefetch_schema(
+            Job.select()
+            .where(Job.id > last_id, Job.active(now))
+            .order_by(Job.id)
+            .limit(batch_size),
+            JobSchema,
+        )
+        if not jobs:
+            break
+        stored = {
+            row.job_id: row
+            for row in JobListing.select().where(
+                JobListing.job.in_([job.id for job in jobs])
+            )
+        }
+        for live in _rows(jobs):
+            row = stored.get(live["job"])
+            if row is None:
+                problems.append((live["job"], "missing"))
+            elif orjson.loads(row.document) != orjson.loads(live["document"]) or (
+                row.category,
+                row.created_on,
+                row.expire_on,
+            ) != (live["category"], live["created_on"], live["expire_on"]):
+                problems.append((live["job"], "stale"))
+        last_id = jobs[-1].id
+    orphans = (
+        JobListing.select(JobListing.job)
+        .join(Job, JOIN.LEFT_OUTER)
+        .where(JobListing.active(now), Job.id.is_null() | ~Job.active(now))
+    )
+    problems += [(row.job_id, "orphan") for row in orphans]
+    return sorted(problems)
+
+
+def _jobs_of(*where) -> list[int]:
+    return [job.id for job in Job.select(Job.id).where(Job.active(), *where)]
+
+
+@post_save(sender=Job)
+def _relist_job(sender, instance, *args, **kwargs):
+    refresh_jobs([instance.id])
+
+
+@m2m_changed(sender=Job)
+def _relist_job_skills(sender, instance, *args, **kwargs):
+    refresh_jobs([instance.id])
+
+
+@post_delete(sender=Job)
+def _unlist_job(sender, instance, *args, **kwargs):
+    unlist_jobs([instance.id])
+
+
+@post_save(sender=Employer)
+def _relist_employer(sender, instance, *args, **kwargs):
+    refresh_jobs(_jobs_of(Job.employer == instance))
+
+
+@post_save(sender=User)
+def _relist_account(sender, instance, *args, **kwargs):
+    if instance.employer_id is not None:
+        refresh_jobs(_jobs_of(Job.employer == instance.employer_id))
+
+
+@post_save(sender=JobCategory)
+def _relist_category(sender, instance, *args, **kwargs):
+    refresh_jobs(_jobs_of(Job.category == instance))
+
+
+@post_save(sender=Guide)
+@post_delete(sender=Guide)
+def _relist_guide(sender, instance, *args, **kwargs):
+    if instance.category_id is not None:
+        refresh_jobs(_jobs_of(Job.category == instance.category_id))
+
+
+# jobs a skill was removed from through `skill.jobs` keep it until their next
+# save or `python -m app.manage listing rebuild`
+@post_save(sender=Skill)
+@m2m_changed(sender=Skill)
+def _relist_skill(sender, instance, *args, **kwargs):
+    JobSkill = Job.skills.get_through_model()
+    refresh_jobs(
+        _jobs_of(
+            Job.id.in_(
+                JobSkill.select(JobSkill.job).where(JobSkill.skill == instance)
+            )
+        )
+    )
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, status, Request, HTTPException, status, Depends
+from fastapi import FastAPI, status, Request, HTTPException, status, Depends, Security
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -6,8 +6,8 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_utils.tasks import repeat_every
 import uvicorn
-from peewee import SqliteDatabase, IntegrityError, DoesNotExist
-from datetime import datetime, timedelta
+from peewee import IntegrityError, DoesNotExist
+from datetime import timedelta
 from logging import getLogger
 from typing import Annotated
 from app.routers import (
@@ -35,19 +35,34 @@ from app.models.dbmodel import (
     Employer,
     User,
     Role,
-    Job,
     database_proxy,
-    JobRequest,
 )
+from app.database import QueryCounter, create_database
 from app.utils import create_access_token, create_refresh_token, create_sudo_token
-from app.deps import decode_refresh_token
+from app.deps import (
+    decode_refresh_token,
+    get_current_user,
+    AsyncDB,
+    Scopes,
+    auth_cache,
+)
+from app.http_cache import cache_responses, response_cache
+from app.database import async_db
+from app.facets import FACETS_REFRESH, facet_index
+from app.clicks import CLICK_FLUSH_INTERVAL, click_counter, course_links
+from app.catalogue import CATALOGUE_CHECK_INTERVAL, catalogue
+from app.guides import guide_bodies
+from app.ranking import rankings
+from app.passwords import hasher
+from app.responses import SchemaJSONResponse
+from app.tasks import EXPIRY_INTERVAL, run_expiry_sweep
 from pydantic import BaseModel
 import redis.asyncio as redis
 
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 
-app = FastAPI()
+app = FastAPI(default_response_class=SchemaJSONResponse)
 app.include_router(me.router, prefix="/me", tags=["User profile"])
 app.include_router(guidance.router, prefix="/guidances", tags=["Guidance"])
 app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
@@ -57,9 +72,13 @@ app.include_router(courses.router, prefix="/courses", tags=["Courses"])
 app.include_router(users.router, prefix="/users", tags=["Other users info"])
 app.include_router(jobrequest.router, prefix="/requests", tags=["Job Request"])
 
-db_ = SqliteDatabase(".testdb.sqlite")
+db_ = create_database()
 database_proxy.initialize(db_)
 
+redis_client = redis.from_url(
+    "redis://localhost", encoding="utf-8", decode_responses=True
+)
+
 
 logger = getLogger("API")
 
@@ -85,15 +104,48 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    with QueryCounter() as counter:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(counter.count)
+    return response
+
+
+app.middleware("http")(cache_responses)
+
+
+@app.get("/cache/stats", include_in_schema=False)
+async def cache_stats(
+    user: Annotated[User, Security(get_current_user, scopes=Scopes.admin)]
+):
+    return {
+        "responses": response_cache.stats(),
+        "auth": auth_cache.stats(),
+        "course_links": course_links.stats(),
+        "guides": guide_bodies.stats(),
+        "rankings": rankings.stats(),
+        "clicks": {
+            "pending": click_counter.pending(),
+            "flushed": click_counter.flushed,
+        },
+        "catalogue": catalogue.stats(),
+    }
+
+
 @app.on_event("startup")
 async def startup():
-    r = redis.from_url("redis://localhost", encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
-    db_.connect()
+    await FastAPILimiter.init(redis_client)
+    # fail fast if the database is unreachable, then hand the connection back
+    db_.connect(reuse_if_open=True)
+    db_.close()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await async_db.run(click_counter.flush)
+    async_db.shutdown()
+    hasher.shutdown()
     db_.close()
 
 
@@ -110,25 +162,38 @@ app.add_middleware(
 )
 
 
-async def expire_jobs():
-    for job in Job.select().where(Job.expire_on <= datetime.now()):
-        job.expired = True
-        job.save()
+@app.on_event("startup")
+@repeat_every(seconds=EXPIRY_INTERVAL, logger=logger)
+async def cron_jobs():
+    await run_expiry_sweep(redis_client)
 
 
-async def expire_job_requests():
-    for jr in JobRequest.select().where(JobRequest.expire_on <= datetime.now()):
-        jr.expired = True
-        jr.save()
+@app.on_event("startup")
+async def build_facets():
+    # awaited, so no request finds the index empty or builds it itself
+    await async_db.run(facet_index.rebuild)
 
 
 @app.on_event("startup")
-@repeat_every(seconds=2 * 3600)  # 2hours
-async def cron_jobs():
-    await expire_jobs()
+@repeat_every(seconds=FACETS_REFRESH, wait_first=True, logger=logger)
+async def refresh_facets():
+    await async_db.run(facet_index.rebuild)
 
 
-async def get_user(username) -> User:
+@app.on_event("startup")
+@repeat_every(seconds=CLICK_FLUSH_INTERVAL, logger=logger)
+async def flush_clicks():
+    await async_db.run(click_counter.flush)
+
+
+@app.on_event("startup")
+@repeat_every(seconds=CATALOGUE_CHECK_INTERVAL, logger=logger)
+async def check_catalogue():
+    # the first run loads it, so requests start warm
+    await async_db.run(catalogue.check)
+
+
+def get_user(username) -> User:
     try:
         result: User
         email_match = Username.email_pattern.fullmatch(username)
@@ -150,75 +215,80 @@ async def get_user(username) -> User:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "user.not_found")
 
 
+def user_info(user: User) -> UserQueryResult:
+    return UserQueryResult(
+        firstname=user.seeker.firstname if user.role == Role.seeker else None,
+        lastname=user.seeker.lastname if user.role == Role.seeker else None,
+        co_name=user.employer.co_name if user.role == Role.employer else None,
+        role=user.role,
+    )
+
+
 @app.post("/user")
-async def check_user(login_info: UserQuery) -> UserQueryResult:
-    result = await get_user(login_info.username)
-    if result.role == Role.employer:
-        return UserQueryResult(co_name=result.employer.co_name, role=Role.employer)
-    elif result.role == Role.seeker:
-        return UserQueryResult(
-            firstname=result.seeker.firstname,
-            lastname=result.seeker.lastname,
-            role=Role.seeker,
-        )
+async def check_user(login_info: UserQuery, db: AsyncDB) -> UserQueryResult:
+    result = await db.run(get_user, login_info.username)
+    return await db.run(user_info, result)
 
 
 @app.post("/login", dependencies=[Depends(RateLimiter(times=2, seconds=3))])
 async def login(
-    login_info: Annotated[OAuth2PasswordRequestForm, Depends()]
+    login_info: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncDB
 ) -> LoginResult:
-    user = await get_user(login_info.username)
+    user = await db.run(get_user, login_info.username)
+    matched, new_hash = await hasher.verify_and_rehash(
+        user.pass_hash, login_info.password
+    )
 
-    if user and user.verify_password(login_info.password):
+    if matched:
+        if new_hash:
+            user.pass_hash = new_hash
+            await db.run(user.save)
         return LoginResult(
             access_token=create_access_token(user),
             refresh_token=create_refresh_token(user),
             sudo_token=create_sudo_token(user),
-            user_info=UserQueryResult(
-                firstname=user.seeker.firstname if user.role == Role.seeker else None,
-                lastname=user.seeker.lastname if user.role == Role.seeker else None,
-                co_name=user.employer.co_name if user.role == Role.employer else None,
-                role=user.role,
-            ),
+            user_info=await db.run(user_info, user),
         )
     raise HTTPException(status.HTTP_401_UNAUTHORIZED, "login.incorrect_password")
 
 
 @app.post("/sudo", dependencies=[Depends(RateLimiter(times=2, seconds=3))])
 async def get_sudo_token(
-    login_info: Annotated[OAuth2PasswordRequestForm, Depends()]
+    login_info: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncDB
 ) -> SudoToken:
-    user = await get_user(login_info.username)
+    user = await db.run(get_user, login_info.username)
 
-    if user and user.verify_password(login_info.password):
+    if await hasher.verify(user.pass_hash, login_info.password):
         return SudoToken(sudo_token=create_sudo_token(user))
     raise HTTPException(status.HTTP_401_UNAUTHORIZED, "login.incorrect_password")
 
 
 @app.post("/token")
-async def refresh_token(user: Annotated[User, Depends(decode_refresh_token)]):
+async def refresh_token(
+    user: Annotated[User, Depends(decode_refresh_token)], db: AsyncDB
+):
     return LoginResult(
         access_token=create_access_token(user),
         refresh_token=create_refresh_token(user),
-        user_info=UserQueryResult(
-            firstname=user.seeker.firstname if user.role == Role.seeker else None,
-            lastname=user.seeker.firstname if user.role == Role.seeker else None,
-            co_name=user.employer.co_name if user.role == Role.employer else None,
-            role=user.role,
-        ),
+        user_info=await db.run(user_info, user),
     )
 
 
 @app.post("/signup", dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-async def signup(signup_info: SignupInfo) -> UserSchema:
+async def signup(signup_info: SignupInfo, db: AsyncDB) -> UserSchema:
     if not (signup_info.employer or signup_info.seeker):
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST,
             "SignupInfo.employer or SignupInfo.seeker missed",
         )
+    pass_hash = await hasher.hash(signup_info.password)
+    return await db.run(create_user, signup_info, pass_hash)
+
+
+def create_user(signup_info: SignupInfo, pass_hash: str) -> UserSchema:
     try:
         user = User.create(
-            pass_hash=User.hash_password(signup_info.password),
+            pass_hash=pass_hash,
             **signup_info.dict(exclude={"employer", "seeker", "password"}),
         )
         if signup_info.role == Role.Employer:
@@ -0,0 +1,260 @@
+"""
+deploy-time maintenance commands:
+
+    python -m app.manage migrate [--to VERSION]
+    python -m app.manage status
+    python -m app.manage explain [--strict]
+    python -m app.manage reindex
+    python -m app.manage listing rebuild|check
+"""
+from argparse import ArgumentParser
+from fastapi import HTTPException
+import logging
+import re
+import sys
+
+from app.database import QueryCounter, create_database
+from app.migrations import MIGRATIONS, applied_versions, migrate
+from app import listing, search
+from app.models.dbmodel import (
+    database_proxy,
+    ForeignGuideMeta,
+    Guide,
+    Job,
+    JobCategory,
+    Role,
+    SqliteDatabase,
+    User,
+)
+from app.models.schemas import MyInfoSchema
+from app.routers import (
+    category,
+    courses,
+    guidance,
+    jobrequest,
+    jobs,
+    literals,
+    me,
+    users,
+)
+
+# SQLite reports an unindexed table walk as "SCAN job" ("SCAN TABLE job" before
+# 3.36), PostgreSQL as "Seq Scan on job"
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$|Seq Scan on")
+
+
+def router_queries():
+    """(route, call) pairs running each router's queries with sample rows"""
+    job = Job.select().first()
+    cat = JobCategory.select().first()
+    guide = Guide.select().first()
+    fgm = ForeignGuideMeta.select().first()
+    seeker = User.select().where(User.role == Role.seeker).first()
+    employer = User.select().where(User.role == Role.employer).first()
+
+    course = cat.course if cat else ""
+    expertise = cat.expertise if cat else ""
+    slug = cat.slug if cat else ""
+    calls = [
+        ("GET /jobs/", lambda: jobs.jobs_page(2, 10, None, False)),
+        ("GET /jobs/?after", lambda: jobs.jobs_page(1, 10, "", True)),
+        ("GET /jobs/{job_id}", lambda: jobs.job_detail(job.id if job else 1)),
+        (
+            "GET /jobs/search",
+            lambda: jobs.search_page(job.title if job else "-", 1, 10),
+        ),
+        (
+            "GET /jobs/filter",
+            lambda: jobs.filter_page(
+                dict(
+                    city=[job.employer.city] if job else [],
+                    category=[slug],
+                    skill=[],
+                    type=[job.type] if job else [],
+                    salary=[],
+                ),
+                1,
+                10,
+            ),
+        ),
+        (
+            "GET /category/search",
+            lambda: category.categories_page(
+                course, expertise, None, None, None, 1, 10, None, None, False
+            ),
+        ),
+        (
+            "GET /category/{slug}/jobs",
+            lambda: category.category_jobs_page(slug, 2, 10, None, False),
+        ),
+        (
+            "GET /category/{slug}/jobs?after",
+            lambda: category.category_jobs_page(slug, 1, 10, "", True),
+        ),
+        ("GET /category/{slug}", lambda: category.category_detail(slug)),
+        (
+            "GET /guidances/search/1",
+            lambda: guidance.search_guides(
+                (JobCategory.course == course) & (JobCategory.expertise == expertise),
+                None,
+                None,
+                1,
+                10,
+            ),
+        ),
+        (
+            "GET /guidances/search/2",
+            lambda: guidance.search_guides(
+                JobCategory.course.in_([course]), None, None, 1, 10
+            ),
+        ),
+        (
+            "GET /guidances/search/3",
+            lambda: guidance.search_guides(
+                JobCategory.course == course, None, None, 1, 10
+            ),
+        ),
+        (
+            "GET /guidances/search/4",
+            lambda: guidance.foreign_guides(
+                (ForeignGuideMeta.course == (fgm.course if fgm else ""))
+                & (ForeignGuideMeta.grade == (fgm.grade if fgm else ""))
+                & (ForeignGuideMeta.motivation == (fgm.motivation if fgm else "")),
+                1,
+                10,
+            ),
+        ),
+        (
+            "GET /guidances/{slug}",
+            lambda: guidance.guide_detail(guide.slug if guide else "-"),
+        ),
+        ("GET /courses/{slug}", lambda: courses.course_link("-")),
+        # prebuilt bodies, listed so a query creeping in shows up
+        ("GET /literals/cities", literals.get_cities),
+        ("GET /literals/branches", literals.get_branches),
+        (
+            "GET /users/employer/{id}",
+            lambda: users.employer_info(employer.id if employer else "-"),
+        ),
+    ]
+    for user in filter(None, (seeker, employer)):
+        calls += [
+            (
+                f"GET /requests/ ({user.role.value})",
+                lambda user=user: jobrequest.requests_page(user, 1, 10, None, False),
+            ),
+            (
+                f"GET /requests/?after ({user.role.value})",
+                lambda user=user: jobrequest.requests_page(user, 1, 10, "", False),
+            ),
+            (
+                f"GET /me/ ({user.role.value})",
+                lambda user=user: user.to_schema(MyInfoSchema),
+            ),
+            (
+                f"GET /me/personalities ({user.role.value})",
+                lambda user=user: me.seeker_personalities(user),
+            ),
+            (
+                f"GET /me/recommended-jobs ({user.role.value})",
+                lambda user=user: me.recommended_jobs(user),
+            ),
+        ]
+    return calls
+
+
+def query_plan(database, sql: str, params) -> list[str]:
+    if isinstance(database, SqliteDatabase):
+        cursor = database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+    cursor = database.execute_sql("EXPLAIN " + sql, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def explain(strict: bool = False) -> int:
+    database = database_proxy.obj
+    seen: dict[str, str] = {}
+    scans = 0
+    for route, call in router_queries():
+        with QueryCounter(record=True) as counter:
+            try:
+                call()
+            except HTTPException:
+                pass
+            except Exception as e:
+                # sample rows may not satisfy the response schema, the
+                # queries ran anyway
+                print(f"{route}: {type(e).__name__}", file=sys.stderr)
+        print(route)
+        for sql, params in counter.statements:
+            if not sql.startswith("SELECT"):
+                continue
+            if sql in seen:
+                print(f"  (query of {seen[sql]})")
+                continue
+            seen[sql] = route
+            print(f"  {sql}")
+            for line in query_plan(database, sql, params):
+                full_scan = bool(FULL_SCAN.search(line))
+                scans += full_scan
+                print(f"    {'!! ' if full_scan else ''}{line}")
+    print(f"{len(seen)} queries, {scans} full scans")
+    return 1 if strict and scans else 0
+
+
+def status() -> int:
+    applied = applied_versions()
+    for version in sorted(MIGRATIONS):
+        row = applied.get(version)
+        state = f"applied {row.applied_on:%Y-%m-%d %H:%M}" if row else "pending"
+        print(f"{version:4d} {MIGRATIONS[version].__name__:30s} {state}")
+    return 0
+
+
+def listing_command(action: str) -> int:
+    if action == "rebuild":
+        print(f"{listing.rebuild_listing()} jobs listed")
+        return 0
+    problems = listing.check_listing()
+    for job_id, problem in problems:
+        print(f"job {job_id}: {problem}")
+    print(f"{len(problems)} inconsistencies")
+    return 1 if problems else 0
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_ = commands.add_parser("migrate", help="apply pending migrations")
+    migrate_.add_argument("--to", type=int, help="stop after this version")
+    commands.add_parser("status", help="list migrations")
+    explain_ = commands.add_parser(
+        "explain", help="print the query plan of every router query"
+    )
+    explain_.add_argument(
+        "--strict", action="store_true", help="exit with 1 on any full scan"
+    )
+    commands.add_parser("reindex", help="rebuild the job search index")
+    listing_ = commands.add_parser("listing", help="job listing read model")
+    listing_.add_argument("action", choices=("rebuild", "check"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    database_proxy.initialize(create_database())
+    with database_proxy.obj.connection_context():
+        if args.command == "migrate":
+            done = migrate(args.to)
+            print(f"{len(done)} migrations applied")
+            return 0
+        if args.command == "status":
+            return status()
+        if args.command == "reindex":
+            print(f"{search.rebuild_index()} jobs indexed")
+            return 0
+        if args.command == "listing":
+            return listing_command(args.action)
+        return explain(args.strict)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
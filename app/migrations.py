@@ -0,0 +1,205 @@
+from datetime import datetime
+from logging import getLogger
+from typing import Callable
+from peewee import (
+    CharField,
+    DateTimeField,
+    IntegerField,
+    Model,
+    PostgresqlDatabase,
+    fn,
+)
+from playhouse.migrate import SchemaMigrator, make_index_name, migrate as apply
+
+from app import listing, search
+from app.models.dbmodel import (
+    BaseModel,
+    CatalogueVersion,
+    Encoded,
+    JsonField,
+    TABLES,
+    database_proxy,
+    Job,
+    JobRequest,
+    JobCategory,
+    JobIndex,
+    JobListing,
+    ForeignGuideMeta,
+    SkillTimeline,
+)
+
+logger = getLogger("API")
+
+BATCH_SIZE = 1000
+
+
+class SchemaVersion(BaseModel):
+    version = IntegerField(primary_key=True)
+    name = CharField()
+    applied_on = DateTimeField(default=datetime.now)
+
+
+# version -> migration. every migration must be a no-op on a database that
+# already has its changes: fresh databases get the whole schema from the
+# first one, then run the rest.
+MIGRATIONS: dict[int, Callable[[SchemaMigrator], None]] = {}
+
+
+def migration(version: int):
+    def decorator(func):
+        if version in MIGRATIONS:
+            raise ValueError(f"duplicate migration version {version}")
+        MIGRATIONS[version] = func
+        return func
+
+    return decorator
+
+
+def add_column(migrator: SchemaMigrator, model: type[Model], name: str, field):
+    table = model._meta.table_name
+    if name not in {c.name for c in migrator.database.get_columns(table)}:
+        apply(migrator.add_column(table, name, field))
+
+
+def add_index(
+    migrator: SchemaMigrator, model: type[Model], *fields: str, unique=False
+):
+    table = model._meta.table_name
+    columns = [model._meta.fields[name].column_name for name in fields]
+    if make_index_name(table, columns) not in {
+        i.name for i in migrator.database.get_indexes(table)
+    }:
+        apply(migrator.add_index(table, columns, unique))
+
+
+@migration(1)
+def create_tables(migrator: SchemaMigrator):
+    migrator.database.create_tables(TABLES, safe=True)
+
+
+@migration(2)
+def add_job_type(migrator: SchemaMigrator):
+    add_column(migrator, Job, "type", CharField(40, default=""))
+
+
+@migration(3)
+def index_created_on(migrator: SchemaMigrator):
+    add_index(migrator, Job, "created_on")
+    add_index(migrator, JobRequest, "created_on")
+
+
+@migration(4)
+def index_job_listing(migrator: SchemaMigrator):
+    add_index(migrator, Job, "expire_on", "created_on")
+
+
+@migration(5)
+def index_hot_paths(migrator: SchemaMigrator):
+    add_index(migrator, Job, "expired", "expire_on")
+    add_index(migrator, Job, "category", "created_on")
+    add_index(migrator, JobRequest, "expired", "expire_on")
+    add_index(migrator, JobRequest, "seeker", "created_on")
+    add_index(migrator, JobCategory, "course", "expertise")
+    add_index(migrator, ForeignGuideMeta, "course", "grade", "motivation")
+    add_index(migrator, SkillTimeline, "guide", "index")
+
+
+@migration(6)
+def create_job_index(migrator: SchemaMigrator):
+    if search.enabled() and not migrator.database.table_exists(
+        JobIndex._meta.table_name
+    ):
+        JobIndex.create_table()
+        search.rebuild_index()
+
+
+@migration(7)
+def create_job_listing(migrator: SchemaMigrator):
+    if not migrator.database.table_exists(JobListing._meta.table_name):
+        JobListing.create_table()
+        listing.rebuild_listing()
+
+
+@migration(8)
+def unique_job_request(migrator: SchemaMigrator):
+    # keeps the first of duplicate requests, then recounts them per job
+    first = JobRequest.select(fn.MIN(JobRequest.id)).group_by(
+        JobRequest.job, JobRequest.seeker
+    )
+    JobRequest.delete().where(JobRequest.id.not_in(first)).execute()
+    add_index(migrator, JobRequest, "job", "seeker", unique=True)
+    Job.update(
+        requests_count=JobRequest.select(fn.COUNT(JobRequest.id)).where(
+            JobRequest.job == Job.id
+        )
+    ).execute()
+
+
+@migration(9)
+def create_catalogue_version(migrator: SchemaMigrator):
+    CatalogueVersion.create_table(safe=True)
+
+
+@migration(10)
+def pack_json_columns(migrator: SchemaMigrator):
+    database = migrator.database
+    fields = [
+        field
+        for model in TABLES
+        for field in model._meta.sorted_fields
+        if isinstance(field, JsonField)
+    ]
+    for field in fields:
+        model, column = field.model, field.column_name
+        table = model._meta.table_name
+        # sqlite columns take blobs whatever their declared type
+        if isinstance(database, PostgresqlDatabase) and any(
+            c.name == column and c.data_type != "bytea"
+            for c in database.get_columns(table)
+        ):
+            database.execute_sql(
+                f'ALTER TABLE "{table}" ALTER COLUMN "{column}" '
+                f"TYPE bytea USING convert_to(\"{column}\", 'UTF8')"
+            )
+        key = model._meta.primary_key
+        last = None
+        while True:
+            query = model.select(key, field).where(field.is_null(False))
+            if last is not None:
+                query = query.where(key > last)
+            rows = list(query.order_by(key).limit(BATCH_SIZE).tuples())
+            if not rows:
+                break
+            for id, value in rows:
+                packed = field.encode(value.decode())
+                if isinstance(value.raw, str) or bytes(value.raw) != packed:
+                    model.update({field: Encoded(field, packed)}).where(
+                        key == id
+                    ).execute()
+            last = rows[-1][0]
+
+
+def applied_versions() -> dict[int, SchemaVersion]:
+    SchemaVersion.create_table(safe=True)
+    return {v.version: v for v in SchemaVersion.select()}
+
+
+def migrate(target: int = None) -> list[int]:
+    """
+    applies pending migrations up to `target` (default: all) on the database
+    behind `database_proxy`, each in its own transaction
+    """
+    database = database_proxy.obj
+    migrator = SchemaMigrator.from_database(database)
+    applied = applied_versions()
+    done = []
+    for version in sorted(MIGRATIONS):
+        if version in applied or (target is not None and version > target):
+            continue
+        func = MIGRATIONS[version]
+        with database.atomic():
+            func(migrator)
+            SchemaVersion.create(version=version, name=func.__name__)
+        logger.info(f"migration {version} ({func.__name__}) applied")
+        done.append(version)
+    return done
@@ -1,11 +1,16 @@
 from peewee import *
-import peewee
 from playhouse.shortcuts import model_to_dict
-from passlib.hash import pbkdf2_sha256
+from playhouse import signals
+from playhouse.sqlite_ext import FTS5Model, RowIDField, SearchField
 from enum import Enum
 from typing import Union
 from hashlib import md5
-from peewee import callable_
+from peewee import (
+    FieldAccessor,
+    ManyToManyFieldAccessor,
+    ManyToManyQuery,
+    callable_,
+)
 import datetime
 from datetime import timedelta
 import pydantic
@@ -19,19 +24,19 @@ from .schemas import (
     RequestState,
     JobType,
 )
+from .serializers import serialize
 from typing import Literal
 from slugify import slugify
 import uuid
 import shortuuid
-import json
+import os
+import zlib
+
+import orjson
 import pydantic
 
-generate_password_hash = lambda p: pbkdf2_sha256.using(rounds=8000, salt_size=10).hash(
-    p
-)
-check_password_hash = lambda hash, password: pbkdf2_sha256.using(
-    rounds=8000, salt_size=10
-).verify(password, hash)
+from app.passwords import generate_password_hash, check_password_hash
+
 database_proxy = DatabaseProxy()
 
 
@@ -56,38 +61,146 @@ class DBTables(list):
         self.append(m2m)
 
 
-class JsonField(CharField):
-    def db_value(self, value):
-        if value:
-            return json.dumps(value)
+# stored JSON at least this long (in bytes) is deflated
+JSON_DEFLATE_MIN = int(os.environ.get("JSON_DEFLATE_MIN", 512))
+DEFLATED = b"\x01"
+
+
+class Encoded:
+    """a JSON column value as read, decoded on first attribute access"""
+
+    __slots__ = ("field", "raw")
+
+    def __init__(self, field: "JsonField", raw) -> None:
+        self.field = field
+        self.raw = raw
+
+    def decode(self):
+        return self.field.decode(self.raw)
+
+
+class JsonAccessor(FieldAccessor):
+    def __get__(self, instance, instance_type=None):
+        if instance is None:
+            return self.field
+        value = instance.__data__.get(self.name)
+        if type(value) is Encoded:
+            value = instance.__data__[self.name] = value.decode()
         return value
 
+
+class JsonField(BlobField):
+    """
+    JSON stored as compact UTF-8 (deflated from `JSON_DEFLATE_MIN` bytes).
+    rows come back as `Encoded` and are decoded on first attribute access, so
+    queries that never read the value never parse it; `.dicts()` and
+    `.tuples()` rows hold the `Encoded` as is.
+    """
+
+    accessor_class = JsonAccessor
+
+    def load(self, data):
+        return orjson.loads(data)
+
+    def dump(self, value) -> bytes:
+        return orjson.dumps(value)
+
+    def encode(self, value) -> bytes:
+        data = self.dump(value)
+        if len(data) >= JSON_DEFLATE_MIN:
+            return DEFLATED + zlib.compress(data)
+        return data
+
+    def decode(self, raw):
+        if isinstance(raw, str):
+            # text written before migration 10
+            return self.load(raw)
+        raw = bytes(raw)
+        if raw[:1] == DEFLATED:
+            raw = zlib.decompress(raw[1:])
+        return self.load(raw)
+
+    def db_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, Encoded):
+            if not isinstance(value.raw, str):
+                # untouched since it was read, written back as it was
+                return super().db_value(bytes(value.raw))
+            value = value.decode()
+        return super().db_value(self.encode(value))
+
     def python_value(self, value):
-        if value:
-            return json.loads(value)
-        return value
+        if value is None:
+            return None
+        return Encoded(self, value)
 
 
-class JsonObjectField(TextField):
+class JsonObjectField(JsonField):
     def __init__(
-        self, json_schema: pydantic.BaseModel, null: bool = ..., **kwargs
+        self, json_schema: type[pydantic.BaseModel], null: bool = False, **kwargs
     ) -> None:
-        super().__init__(null, **kwargs)
+        super().__init__(null=null, **kwargs)
         self.json_schema = json_schema
 
-    def db_value(self, value: pydantic.BaseModel):
-        if value in None:
-            return None
-        elif isinstance(value, self.json_schema):
-            return value.json()
-        raise ValueError(f"value must be an instance of {type(self.json_schema)}")
+    def load(self, data):
+        return self.json_schema.parse_obj(orjson.loads(data))
+
+    def dump(self, value: pydantic.BaseModel) -> bytes:
+        if not isinstance(value, self.json_schema):
+            raise ValueError(f"value must be an instance of {self.json_schema}")
+        return orjson.dumps(value.dict())
+
+
+# sent as (instance, field=...) after `add`, `remove` or `clear` on one side
+# of a `NotifyingManyToManyField`, which peewee does with bare inserts and
+# deletes on the through table
+m2m_changed = signals.Signal()
+
+
+class NotifyingManyToManyQuery(ManyToManyQuery):
+    def _changed(self) -> None:
+        m2m_changed.send(self._instance, field=self._accessor.field)
 
-    def python_value(self, value: str | None):
-        if value:
-            return self.json_schema(**json.loads(value))
+    def add(self, value, clear_existing=False):
+        super().add(value, clear_existing)
+        self._changed()
+
+    def remove(self, value):
+        result = super().remove(value)
+        self._changed()
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self._changed()
+        return result
+
+
+class NotifyingManyToManyAccessor(ManyToManyFieldAccessor):
+    def __get__(self, instance, instance_type=None, force_query=False):
+        value = super().__get__(instance, instance_type, force_query)
+        if type(value) is ManyToManyQuery:
+            # same state, only `add`/`remove`/`clear` differ
+            value.__class__ = NotifyingManyToManyQuery
         return value
 
 
+class NotifyingManyToManyField(ManyToManyField):
+    accessor_class = NotifyingManyToManyAccessor
+
+    def bind(self, model, name, set_attribute=True):
+        super().bind(model, name, set_attribute)
+        # peewee declares the other side as a plain `ManyToManyField`
+        if not self._is_backref and self.backref in self.rel_model._meta.manytomany:
+            backref = self.rel_model._meta.manytomany[self.backref]
+            setattr(
+                self.rel_model,
+                self.backref,
+                NotifyingManyToManyAccessor(self.rel_model, backref, self.backref),
+            )
+
+
 class EnumField(FixedCharField):
     def __init__(self, choices: Enum, *args, **kwargs):
         length = max(map(lambda e: len(e.value), choices))
@@ -101,8 +214,10 @@ class EnumField(FixedCharField):
         return value and self.enum(value)
 
 
-class BaseModel(Model):
+class BaseModel(signals.Model):
     _default_schema_: pydantic.main.ModelMetaclass = None
+    # schema field (usually a property) -> relation it reads, for prefetch
+    _prefetch_: dict[str, str] = {}
 
     def __init__(self, *args, **kwargs) -> None:
         if "slug" in self._meta.fields and "slug" not in kwargs:
@@ -120,33 +235,14 @@ class BaseModel(Model):
         database = database_proxy
         only_save_dirty = True
 
+    def prefetched(self, name: str) -> list | None:
+        value = self.__dict__.get(name)
+        return value if isinstance(value, list) else None
+
     def to_schema(
         self, type_: pydantic.BaseModel = DEFAULT, **kwargs
     ) -> pydantic.BaseModel:
-        data = {}
-        type_ = _default(type_, self._default_schema_)
-        for name, field in type_.__fields__.items():
-            if name in kwargs:
-                data[name] = kwargs[name]
-                continue
-            value = getattr(self, name)
-            value_type = type(value)
-            if isinstance(value, BaseModel):
-                value = value.to_schema(field.type_)
-            if (
-                field in self._meta.manytomany
-                or field in self._meta.backrefs
-                or isinstance(value, peewee.ModelSelect)
-            ):
-                l = []
-                for v in value:
-                    l.append(v.to_schema(field.sub_fields[0].type_))
-                if l:
-                    value = l
-                else:
-                    continue
-            data[name] = value
-        return type_(**data)
+        return serialize(self, _default(type_, self._default_schema_), kwargs)
 
 
 TABLES = DBTables()
@@ -170,6 +266,9 @@ class JobCategory(BaseModel):
     max_salary = IntegerField(null=True)
     type = EnumField(JobType)
 
+    class Meta:
+        indexes = ((("course", "expertise"), False),)
+
     # personalities <> Personality.job_categories
     # jobs < Job.category
     # guides < Guide.category
@@ -190,6 +289,9 @@ class ForeignGuideMeta(BaseModel):
     motivation = EnumField(ForeignGuideMotivation)
     # guides
 
+    class Meta:
+        indexes = ((("course", "grade", "motivation"), False),)
+
 
 @add_table
 class Guide(BaseModel):
@@ -201,8 +303,12 @@ class Guide(BaseModel):
     category = ForeignKeyField(JobCategory, backref="guides", null=True)
     foreign_meta = ForeignKeyField(ForeignGuideMeta, backref="guides", null=True)
 
+    _prefetch_ = {"roadmap": "timeline"}
+
     @property
     def roadmap(self):
+        if (timeline := self.prefetched("timeline")) is not None:
+            return sorted(timeline, key=lambda st: st.index)
         return self.timeline.select().order_by(SkillTimeline.index)
 
     # job_category - JobCategory.guide
@@ -218,8 +324,12 @@ class Skill(BaseModel):
     description = CharField(null=True)
     exam_scores = JsonField(null=True)
 
+    _prefetch_ = {"exam": "exams"}
+
     @property
     def exam(self) -> Union["Exam", None]:
+        if (exams := self.prefetched("exams")) is not None:
+            return exams[0] if exams else None
         return self.exams.get_or_none()
 
     @exam.setter
@@ -246,6 +356,7 @@ class Course(BaseModel):
 @add_table
 class Employer(BaseModel):
     _default_schema_ = EmployerSchema
+    _prefetch_ = {"account": "account_set", "avatar": "account_set"}
 
     co_name = TextField(null=True)
     co_address = TextField(null=True)
@@ -255,6 +366,10 @@ class Employer(BaseModel):
 
     @property
     def account(self) -> "User":
+        if (accounts := self.prefetched("account_set")) is not None:
+            if not accounts:
+                raise User.DoesNotExist
+            return accounts[0]
         return self.account_set.get()
 
     @account.setter
@@ -277,6 +392,7 @@ class Employer(BaseModel):
 @add_table
 class Seeker(BaseModel):
     # _default_schema_ = SeekerSchema
+    _prefetch_ = {"account": "account_set", "avatar": "account_set"}
 
     firstname = CharField()
     lastname = CharField()
@@ -286,6 +402,10 @@ class Seeker(BaseModel):
 
     @property
     def account(self) -> "User":
+        if (accounts := self.prefetched("account_set")) is not None:
+            if not accounts:
+                raise User.DoesNotExist
+            return accounts[0]
         return self.account_set.get()
 
     @account.setter
@@ -393,24 +513,71 @@ class ExamProcess(BaseModel):
     data = JsonObjectField(ExamProcessDataSchema, null=True)
 
 
+def time_ago(created_on: datetime.datetime) -> dict:
+    delta: timedelta = datetime.datetime.now() - created_on
+    unit = "مدت‌ها پیش"
+    amount = 0
+    if delta.days < 1:
+        if delta.seconds < 10 * 60:
+            unit = "به تازگی"
+        elif delta.seconds // 60 < 25:
+            unit = "دقایقی پیش"
+        elif delta.seconds // 60 < 35:
+            unit = "نیم‌ساعت پیش"
+        elif delta.seconds // 60 < 60:
+            unit = "دقیقه پیش"
+            amount = delta.seconds // 60
+        elif delta.seconds // 3600 < 10:
+            unit = "ساعت پیش"
+            amount = delta.seconds // 3600
+        elif delta.seconds // 3600 < 24:
+            unit = "امروز"
+    if delta.days == 1:
+        unit = "دیروز"
+    elif 1 < delta.days < 7:
+        unit = "روز پیش"
+        amount = delta.days
+    elif 1 <= delta.days < 30:
+        unit = "هفته قبل"
+        amount = delta.days // 7
+    elif 1 <= delta.days // 30 < 12:
+        unit = "ماه پیش"
+        amount = delta.days // 30
+    return dict(unit=unit, amount=amount)
+
+
 @add_table
 class Job(BaseModel):
     title = CharField()
     description = TextField()
     requirements = JsonField()
-    skills = ManyToManyField(Skill, backref="jobs")
+    skills = NotifyingManyToManyField(Skill, backref="jobs")
     category = ForeignKeyField(JobCategory, backref="jobs", null=True)
     min_salary = IntegerField()
     max_salary = IntegerField()
-    created_on = DateTimeField(default=datetime.datetime.now)
+    created_on = DateTimeField(default=datetime.datetime.now, index=True)
     expire_on = DateTimeField()
+    # set by the expiry sweep; listings filter on `Job.active()` instead
     expired = BooleanField(False, default=False)
     employer = ForeignKeyField(Employer, backref="jobs")
     day_time = CharField(40)
+    type = CharField(40)
     requests_count = IntegerField(default=0)
 
     # requests < JobRequests.job
 
+    class Meta:
+        indexes = (
+            (("expire_on", "created_on"), False),
+            (("expired", "expire_on"), False),
+            (("category", "created_on"), False),
+        )
+
+    @classmethod
+    def active(cls, now: datetime.datetime = None):
+        """jobs not past `expire_on`, regardless of when the sweep last ran"""
+        return cls.expire_on > (now or datetime.datetime.now())
+
     @property
     def salary(self) -> dict[str:int] | None:
         if self.min_salary == 0 or self.max_salary == 0:
@@ -419,55 +586,89 @@ class Job(BaseModel):
 
     @property
     def timedelta(self):
-        delta: timedelta = datetime.datetime.now() - self.created_on
-        unit = "مدت‌ها پیش"
-        amount = 0
-        if delta.days < 1:
-            if delta.seconds < 10 * 60:
-                unit = "به تازگی"
-            elif delta.seconds // 60 < 25:
-                unit = "دقایقی پیش"
-            elif delta.seconds // 60 < 35:
-                unit = "نیم‌ساعت پیش"
-            elif delta.seconds // 60 < 60:
-                unit = "دقیقه پیش"
-                amount = delta.seconds // 60
-            elif delta.seconds // 3600 < 10:
-                unit = "ساعت پیش"
-                amount = delta.seconds // 3600
-            elif delta.seconds // 3600 < 24:
-                unit = "امروز"
-        if delta.days == 1:
-            unit = "دیروز"
-        elif 1 < delta.days < 7:
-            unit = "روز پیش"
-            amount = delta.days
-        elif 1 <= delta.days < 30:
-            unit = "هفته قبل"
-            amount = delta.days // 7
-        elif 1 <= delta.days // 30 < 12:
-            unit = "ماه پیش"
-            amount = delta.days // 30
-        return dict(unit=unit, amount=amount)
+        return time_ago(self.created_on)
+
+
+@add_table
+class JobIndex(FTS5Model):
+    """keyword index of jobs, normalized text kept in sync by `app.search`"""
+
+    rowid = RowIDField()  # Job.id
+    title = SearchField()
+    skills = SearchField()
+    requirements = SearchField()
+    description = SearchField()
+
+    class Meta:
+        database = database_proxy
+        options = {"tokenize": "unicode61 remove_diacritics 2", "prefix": "2 3"}
+
+    @classmethod
+    def create_table(cls, safe=True, **options):
+        # FTS5 is SQLite only, other backends go without keyword search
+        if isinstance(cls._meta.database.obj, SqliteDatabase):
+            super().create_table(safe, **options)
+
+
+@add_table
+class CatalogueVersion(BaseModel):
+    """single row, bumped on catalogue writes so workers reload `app.catalogue`"""
+
+    version = IntegerField(default=0)
+
+
+@add_table
+class JobListing(BaseModel):
+    """
+    read model of active jobs: the rendered `JobSchema` of each, kept in sync
+    by `app.listing`, so listings read one row per job
+    """
+
+    job = ForeignKeyField(
+        Job, primary_key=True, backref="listing_set", on_delete="CASCADE"
+    )
+    category = CharField(null=True)
+    created_on = DateTimeField()
+    expire_on = DateTimeField()
+    # JSON by alias; the time dependent `timedelta` is filled in on read
+    document = TextField()
+
+    class Meta:
+        indexes = (
+            (("expire_on", "created_on"), False),
+            (("category", "created_on"), False),
+        )
+
+    @classmethod
+    def active(cls, now: datetime.datetime = None):
+        return cls.expire_on > (now or datetime.datetime.now())
 
 
 @add_table
 class JobRequest(BaseModel):
     job = ForeignKeyField(Job, backref="requests")
     seeker = ForeignKeyField(Seeker, backref="job_requests")
-    created_on = DateTimeField(default=datetime.datetime.now)
+    created_on = DateTimeField(default=datetime.datetime.now, index=True)
     expire_on = DateTimeField(default=datetime.datetime.now)
     expired = BooleanField(default=False)
     state = EnumField(RequestState, default=RequestState.processing)
 
+    class Meta:
+        indexes = (
+            (("expired", "expire_on"), False),
+            (("seeker", "created_on"), False),
+            # a seeker applies to a job once
+            (("job", "seeker"), True),
+        )
+
 
 @add_table
 class Personality(BaseModel):
     slug = FixedCharField(21, primary_key=True)
     test = FixedCharField(10)
     model = FixedCharField(10)
-    seekers = ManyToManyField(Seeker, "personalities")
-    job_categories = ManyToManyField(JobCategory, "personalities")
+    seekers = NotifyingManyToManyField(Seeker, "personalities")
+    job_categories = NotifyingManyToManyField(JobCategory, "personalities")
 
     @classmethod
     def slugify(cls, max_len, **kwargs):
@@ -483,6 +684,9 @@ class SkillTimeline(BaseModel):
     skill = ForeignKeyField(Skill)
     index = IntegerField()
 
+    class Meta:
+        indexes = ((("guide", "index"), False),)
+
     @property
     def courses(self):
         return self.skill.courses
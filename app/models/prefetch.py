@@ -0,0 +1,175 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from peewee import JOIN, ForeignKeyField, ManyToManyField, ModelSelect
+import pydantic
+
+FK = "fk"
+BACKREF = "backref"
+M2M = "m2m"
+
+
+@dataclass
+class Relation:
+    name: str
+    kind: str
+    field: ForeignKeyField | ManyToManyField
+    model: type
+    plan: "Plan"
+
+
+@dataclass
+class Plan:
+    model: type
+    relations: dict[str, Relation] = field(default_factory=dict)
+
+    def add(self, relation: Relation):
+        if relation.name in self.relations:
+            self.relations[relation.name].plan.merge(relation.plan)
+        else:
+            self.relations[relation.name] = relation
+
+    def merge(self, other: "Plan"):
+        for relation in other.relations.values():
+            self.add(relation)
+
+
+def _is_schema(type_) -> bool:
+    return isinstance(type_, type) and issubclass(type_, pydantic.BaseModel)
+
+
+def _find_relation(model, name: str) -> tuple[str, object, type] | None:
+    if name in model._meta.manytomany:
+        m2m = model._meta.manytomany[name]
+        return M2M, m2m, m2m.rel_model
+    fk = model._meta.fields.get(name)
+    if isinstance(fk, ForeignKeyField):
+        return FK, fk, fk.rel_model
+    for fk in model._meta.backrefs:
+        if fk.backref == name:
+            return BACKREF, fk, fk.model
+
+
+def _build_plan(model, schema) -> Plan:
+    plan = Plan(model)
+    hints = getattr(model, "_prefetch_", {})
+    for name, model_field in schema.__fields__.items():
+        nested = model_field.type_ if _is_schema(model_field.type_) else None
+        if nested is None and name not in hints:
+            continue
+        rel_name = hints.get(name, name)
+        found = _find_relation(model, rel_name)
+        if found is None:
+            continue
+        kind, field_, target = found
+        sub_plan = _build_plan(target, nested) if nested else Plan(target)
+        plan.add(Relation(rel_name, kind, field_, target, sub_plan))
+    return plan
+
+
+@lru_cache(maxsize=None)
+def schema_plan(model, schema) -> Plan:
+    """relations of `model` that `schema` (recursively) reads"""
+    return _build_plan(model, schema)
+
+
+def _join_fks(query: ModelSelect, plan: Plan, source) -> ModelSelect:
+    for rel in plan.relations.values():
+        if rel.kind != FK:
+            continue
+        alias = rel.model.alias()
+        on = getattr(source, rel.field.name) == getattr(
+            alias, rel.field.rel_field.name
+        )
+        query = query.join_from(
+            source, alias, JOIN.LEFT_OUTER, on=on, attr=rel.name
+        ).select_extend(alias)
+        query = _join_fks(query, rel.plan, alias)
+    return query
+
+
+def _load_fk(instances, rel: Relation) -> list:
+    ids = {inst.__data__.get(rel.field.name) for inst in instances} - {None}
+    if not ids:
+        return []
+    key = rel.field.rel_field
+    rows = {
+        row.__data__[key.name]: row
+        for row in rel.model.select().where(key.in_(ids))
+    }
+    for inst in instances:
+        obj = rows.get(inst.__data__.get(rel.field.name))
+        if obj is not None:
+            inst.__rel__[rel.name] = obj
+    return list(rows.values())
+
+
+def _load_backref(instances, rel: Relation) -> list:
+    key = rel.field.rel_field.name
+    ids = {inst.__data__.get(key) for inst in instances} - {None}
+    groups = defaultdict(list)
+    rows = []
+    if ids:
+        for row in rel.model.select().where(rel.field.in_(ids)):
+            groups[row.__data__[rel.field.name]].append(row)
+            rows.append(row)
+    for inst in instances:
+        children = groups.get(inst.__data__.get(key), [])
+        for child in children:
+            child.__rel__[rel.field.name] = inst
+        setattr(inst, rel.name, children)
+    return rows
+
+
+def _load_m2m(instances, rel: Relation) -> list:
+    through = rel.field.through_model
+    src_fk = through._meta.model_refs[rel.field.model][0]
+    dest_fk = through._meta.model_refs[rel.field.rel_model][0]
+    if src_fk.backref == "+":
+        return []
+    key = src_fk.rel_field.name
+    ids = {inst.__data__.get(key) for inst in instances} - {None}
+    groups = defaultdict(list)
+    if ids:
+        query = (
+            through.select(through, rel.model)
+            .join(rel.model, on=dest_fk, attr=dest_fk.name)
+            .where(src_fk.in_(ids))
+        )
+        for row in query:
+            groups[row.__data__[src_fk.name]].append(row)
+    targets = []
+    for inst in instances:
+        # ManyToManyFieldAccessor reads the through-model backref list
+        links = groups.get(inst.__data__.get(key), [])
+        setattr(inst, src_fk.backref, links)
+        targets.extend(link.__rel__[dest_fk.name] for link in links)
+    return targets
+
+
+def _load(instances, plan: Plan, joined: bool):
+    if not instances:
+        return
+    for rel in plan.relations.values():
+        if rel.kind == FK:
+            if joined:
+                targets = [i.__rel__[rel.name] for i in instances if rel.name in i.__rel__]
+            else:
+                targets = _load_fk(instances, rel)
+            _load(targets, rel.plan, joined)
+        elif rel.kind == BACKREF:
+            _load(_load_backref(instances, rel), rel.plan, False)
+        else:
+            _load(_load_m2m(instances, rel), rel.plan, False)
+
+
+def prefetch_schema(query: ModelSelect, schema) -> list:
+    """
+    runs `query` and preloads every relation `schema` needs for `to_schema`:
+    foreign keys are joined into `query`, backrefs and many-to-many fields are
+    loaded with one `IN` query per relation for the whole result set.
+    """
+    plan = schema_plan(query.model, schema)
+    instances = list(_join_fks(query, plan, query.model))
+    _load(instances, plan, joined=True)
+    return instances
@@ -48,6 +48,19 @@ class Salary(str, Enum):
     ...
 
 
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class SalaryRange(str, Enum):
+    agreement = "agreement"
+    lt10m = "lt10m"
+    m10_20 = "10m-20m"
+    m20_40 = "20m-40m"
+    gt40m = "gt40m"
+
+
 class PhoneNumber(str):
     @classmethod
     def __get_validators__(cls):
@@ -298,10 +311,13 @@ class JobCategorySchema(BaseModel):
 
 
 class PaginationMeta(BaseModel):
-    total_count: PositiveInt
-    page_count: PositiveInt
-    current_page: PositiveInt
+    # page_count/current_page are omitted in cursor mode, total_count too
+    # unless it was requested
+    total_count: PositiveInt = None
+    page_count: PositiveInt = None
+    current_page: PositiveInt = None
     per_page: PositiveInt
+    next_cursor: str = None
 
 
 class JobSchema(BaseModel):
@@ -324,6 +340,44 @@ class JobsPage(BaseModel):
     jobs: list[JobSchema]
 
 
+# `JobsPage` served from the listing read model: `jobs` are the stored
+# documents, already shaped as `JobSchema`, so they are sent as they are
+class ListedJobsPage(BaseModel):
+    meta: PaginationMeta
+    jobs: list[dict]
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class JobFacets(BaseModel):
+    city: list[FacetCount]
+    category: list[FacetCount]
+    skill: list[FacetCount]
+    type: list[FacetCount]
+    salary: list[FacetCount]
+
+
+class FacetedJobsPage(BaseModel):
+    meta: PaginationMeta
+    jobs: list[JobSchema]
+    facets: JobFacets = Field(
+        description="approximate: may lag writes made through other workers "
+        "until their next periodic rebuild"
+    )
+
+
+class RecommendedJob(BaseModel):
+    score: int
+    job: JobSchema
+
+
+class RecommendedJobs(BaseModel):
+    jobs: list[RecommendedJob]
+
+
 class GuidesPage(BaseModel):
     meta: PaginationMeta
     guides: list[GuideItem]
@@ -364,6 +418,15 @@ class JobRequestSchema(BaseModel):
     state: RequestState
 
 
+class RankedJobRequest(JobRequestSchema):
+    score: float
+
+
 class JobRequestPage(BaseModel):
     meta: PaginationMeta
     requests: list[JobRequestSchema]
+
+
+class RankedJobRequestPage(BaseModel):
+    meta: PaginationMeta
+    requests: list[RankedJobRequest]
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from fastapi.encoders import jsonable_encoder
+from functools import lru_cache
+from peewee import FieldAccessor, Model, ModelSelect
+from pydantic import ValidationError
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+import orjson
+import pydantic
+
+SCALAR = "scalar"
+NESTED = "nested"
+MANY = "many"
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    name: str
+    field: ModelField
+    kind: str
+    # plain column, read straight from `__data__`
+    column: bool
+    nested: type[pydantic.BaseModel] | None
+    # values of exactly this type are used as they are, others are validated
+    exact: type | None
+
+
+def _is_schema(type_) -> bool:
+    return isinstance(type_, type) and issubclass(type_, pydantic.BaseModel)
+
+
+def _field_plan(model: type[Model], name: str, field: ModelField) -> FieldPlan:
+    column = type(getattr(model, name, None)) is FieldAccessor
+    nested = field.type_ if _is_schema(field.type_) else None
+    exact = None
+    if nested is not None and field.shape == SHAPE_SINGLETON:
+        kind = NESTED
+    elif nested is not None and field.shape == SHAPE_LIST:
+        kind = MANY
+    else:
+        kind, nested = SCALAR, None
+        if field.shape == SHAPE_SINGLETON and isinstance(field.outer_type_, type):
+            exact = field.outer_type_
+    return FieldPlan(name, field, kind, column, nested, exact)
+
+
+@lru_cache(maxsize=None)
+def compile_plan(model: type[Model], schema: type[pydantic.BaseModel]):
+    return tuple(
+        _field_plan(model, name, field) for name, field in schema.__fields__.items()
+    )
+
+
+_SKIP = object()
+
+
+def _convert(plan: FieldPlan, value, values: dict, schema):
+    if value is None:
+        if plan.field.allow_none:
+            return None
+    elif plan.kind == NESTED:
+        if isinstance(value, Model):
+            return serialize(value, plan.nested)
+        if isinstance(value, plan.nested):
+            return value
+    elif plan.kind == MANY and isinstance(value, (list, ModelSelect)):
+        items = [
+            serialize(v, plan.nested) if isinstance(v, Model) else v for v in value
+        ]
+        if not items:
+            # the schema default when there is one
+            return [] if plan.field.required else _SKIP
+        if all(isinstance(v, plan.nested) for v in items):
+            return items
+        value = items
+    elif type(value) is plan.exact:
+        return value
+    value, error = plan.field.validate(value, values, loc=plan.name, cls=schema)
+    if error:
+        raise ValidationError([error], schema)
+    return value
+
+
+def serialize(obj: Model, schema: type[pydantic.BaseModel], overrides: dict = None):
+    """
+    builds `schema` from `obj` with the plan compiled for the pair; values
+    already of the right type skip validation
+    """
+    values = {}
+    data = obj.__data__
+    for plan in compile_plan(type(obj), schema):
+        if overrides and plan.name in overrides:
+            value = overrides[plan.name]
+        elif plan.column:
+            value = data.get(plan.name)
+        else:
+            value = getattr(obj, plan.name)
+        value = _convert(plan, value, values, schema)
+        if value is not _SKIP:
+            values[plan.name] = value
+    return schema.construct(set(values), **values)
+
+
+@lru_cache(maxsize=None)
+def _aliases(schema: type[pydantic.BaseModel]) -> tuple[tuple[str, str], ...]:
+    return tuple((name, field.alias) for name, field in schema.__fields__.items())
+
+
+def _encode(obj):
+    if isinstance(obj, pydantic.BaseModel):
+        values = obj.__dict__
+        return {
+            alias: values[name] for name, alias in _aliases(type(obj)) if name in values
+        }
+    return jsonable_encoder(obj)
+
+
+def dumps(content) -> bytes:
+    """
+    JSON bytes of schema objects (by alias, as FastAPI renders them) without
+    the intermediate dicts of `.dict()` and `jsonable_encoder`
+    """
+    return orjson.dumps(content, default=_encode, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,69 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from fastapi import HTTPException, status
+from peewee import Field, ModelSelect
+import json
+
+from app.models.schemas import PaginationMeta
+from app.models.prefetch import prefetch_schema
+
+
+def encode_cursor(row, keys: tuple[Field, ...]) -> str:
+    values = [key.db_value(row.__data__[key.name]) for key in keys]
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, keys: tuple[Field, ...]) -> list:
+    try:
+        raw = urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [key.python_value(value) for key, value in zip(keys, values)]
+    except (BinasciiError, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "bad_cursor")
+
+
+def _seek(keys: tuple[Field, ...], values: list, descending: bool):
+    # (k1 <= v1) AND (k1 < v1 OR <rest>): the leading term is a plain range
+    # predicate, so the scan starts at the cursor position in the index
+    key, value = keys[0], values[0]
+    after = key < value if descending else key > value
+    if len(keys) == 1:
+        return after
+    at_or_after = key <= value if descending else key >= value
+    return at_or_after & (after | _seek(keys[1:], values[1:], descending))
+
+
+def keyset_paginate(
+    query: ModelSelect,
+    keys: tuple[Field, ...],
+    after: str,
+    per_page: int,
+    schema=None,
+    descending: bool = True,
+) -> tuple[list, str | None]:
+    """
+    cursor pagination over `keys` (the last key must be unique); returns the
+    page rows and the cursor for the next page (None on the last page)
+    """
+    query = query.order_by(*(key.desc() if descending else key for key in keys))
+    if after:
+        query = query.where(_seek(keys, decode_cursor(after, keys), descending))
+    query = query.limit(per_page + 1)
+    rows = prefetch_schema(query, schema) if schema else list(query)
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return rows, encode_cursor(rows[-1], keys)
+    return rows, None
+
+
+def cursor_meta(
+    query: ModelSelect, per_page: int, next_cursor: str | None, count: bool
+) -> PaginationMeta:
+    return PaginationMeta(
+        total_count=(query.count() or None) if count else None,
+        per_page=per_page,
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from passlib.hash import pbkdf2_sha256
+import asyncio
+import os
+
+# pbkdf2 iterations for new hashes; stored hashes with a different count are
+# re-hashed on the next successful login
+PASSWORD_ROUNDS = int(os.environ.get("PASSWORD_ROUNDS", 8000))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 1))
+# hashing jobs allowed to wait for a worker before answering 503
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", HASH_WORKERS * 8))
+
+
+def generate_password_hash(password: str) -> str:
+    return pbkdf2_sha256.using(rounds=PASSWORD_ROUNDS, salt_size=10).hash(password)
+
+
+def check_password_hash(pass_hash: str, password: str) -> bool:
+    return pbkdf2_sha256.verify(password, pass_hash)
+
+
+def check_and_rehash(pass_hash: str, password: str) -> tuple[bool, str | None]:
+    """returns (password matches, new hash if the stored cost is outdated)"""
+    if not check_password_hash(pass_hash, password):
+        return False, None
+    if pbkdf2_sha256.from_string(pass_hash).rounds != PASSWORD_ROUNDS:
+        return True, generate_password_hash(password)
+    return True, None
+
+
+class PasswordHasher:
+    """runs pbkdf2 on a process pool so logins don't block the event loop"""
+
+    def __init__(self, workers: int, queue_limit: int) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "server.busy",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(generate_password_hash, password)
+
+    async def verify(self, pass_hash: str, password: str) -> bool:
+        return await self._run(check_password_hash, pass_hash, password)
+
+    async def verify_and_rehash(
+        self, pass_hash: str, password: str
+    ) -> tuple[bool, str | None]:
+        return await self._run(check_and_rehash, pass_hash, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(HASH_WORKERS, HASH_QUEUE_LIMIT)
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+import os
+
+from peewee import Case
+
+from app.models.dbmodel import Seeker
+
+# job requests a seeker may send per window; a window starts with the first
+# request after the previous one ended
+REQUEST_QUOTA = int(os.environ.get("REQUEST_QUOTA", 5))
+REQUEST_QUOTA_WINDOW = int(os.environ.get("REQUEST_QUOTA_WINDOW", 24 * 3600))
+
+
+def take_request_slot(
+    seeker_id: int, now: datetime = None, quota: int = REQUEST_QUOTA
+) -> bool:
+    """
+    counts a request against the seeker's quota, False when it's used up.
+    one conditional UPDATE: the database serializes concurrent takes on the
+    row, so two workers can't both see the last free slot.
+    """
+    now = now or datetime.now()
+    window_over = Seeker.req_lim_date.is_null() | (
+        Seeker.req_lim_date <= now - timedelta(seconds=REQUEST_QUOTA_WINDOW)
+    )
+    taken = (
+        Seeker.update(
+            req_lim_count=Case(None, [(window_over, 1)], Seeker.req_lim_count + 1),
+            req_lim_date=Case(None, [(window_over, now)], Seeker.req_lim_date),
+        )
+        .where(Seeker.id == seeker_id, window_over | (Seeker.req_lim_count < quota))
+        .execute()
+    )
+    return taken == 1
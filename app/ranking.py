@@ -0,0 +1,165 @@
+from collections import defaultdict
+import os
+
+from peewee import fn
+from playhouse.signals import post_save, post_delete
+
+from app.cache import GuardedTTLCache
+from app.catalogue import catalogue
+from app.models.dbmodel import (
+    Exam,
+    ExamResult,
+    Job,
+    JobCategory,
+    JobRequest,
+    Personality,
+    Seeker,
+    SeekerSkill,
+    Skill,
+    m2m_changed,
+)
+
+# a candidate's score: the weighted means of their skill scores and exam
+# scores over the job's skills (missing ones count 0), plus RANK_FIT_WEIGHT
+# when one of their personalities suits the job's category
+RANK_SKILL_WEIGHT = float(os.environ.get("RANK_SKILL_WEIGHT", 0.5))
+RANK_EXAM_WEIGHT = float(os.environ.get("RANK_EXAM_WEIGHT", 0.3))
+RANK_FIT_WEIGHT = float(os.environ.get("RANK_FIT_WEIGHT", 20))
+RANKING_CACHE_SIZE = int(os.environ.get("RANKING_CACHE_SIZE", 500))
+# bounds how long other workers rank with changed scores
+RANKING_CACHE_TTL = int(os.environ.get("RANKING_CACHE_TTL", 300))  # seconds
+
+# job id -> (employer id, ((request id, score), ...) best first)
+rankings = GuardedTTLCache(RANKING_CACHE_SIZE, RANKING_CACHE_TTL)
+
+
+def _applicants(job_id: int):
+    return JobRequest.select(JobRequest.seeker).where(JobRequest.job == job_id)
+
+
+def score_requests(job: Job) -> list[tuple[int, float]]:
+    """
+    (request id, score) of every request for `job`, best first. features are
+    loaded for all applicants at once, a fixed 5 queries per job.
+    """
+    JobSkill = Job.skills.get_through_model()
+    SeekerPersonality = Personality.seekers.get_through_model()
+    skills = [
+        skill
+        for (skill,) in JobSkill.select(JobSkill.skill)
+        .where(JobSkill.job == job.id)
+        .tuples()
+    ]
+    requests = list(
+        JobRequest.select(JobRequest.id, JobRequest.seeker)
+        .where(JobRequest.job == job.id)
+        .tuples()
+    )
+    skill_scores, exam_scores = defaultdict(int), defaultdict(int)
+    for seeker, score in (
+        SeekerSkill.select(SeekerSkill.seeker, fn.SUM(SeekerSkill.score))
+        .where(
+            SeekerSkill.seeker.in_(_applicants(job.id)),
+            SeekerSkill.skill.in_(skills),
+        )
+        .group_by(SeekerSkill.seeker)
+        .tuples()
+    ):
+        skill_scores[seeker] = score
+    best = (
+        ExamResult.select(
+            ExamResult.seeker, fn.MAX(ExamResult.score).alias("score")
+        )
+        .join(Exam)
+        .where(ExamResult.seeker.in_(_applicants(job.id)), Exam.skill.in_(skills))
+        .group_by(ExamResult.seeker, Exam.skill)
+    )
+    for seeker, score in best.tuples():
+        exam_scores[seeker] += score
+    suits = {
+        personality
+        for personality, categories in (
+            catalogue.snapshot.personality_categories.items()
+        )
+        if job.category_id in categories
+    }
+    fits = {
+        seeker
+        for (seeker,) in SeekerPersonality.select(SeekerPersonality.seeker)
+        .where(
+            SeekerPersonality.seeker.in_(_applicants(job.id)),
+            SeekerPersonality.personality.in_(suits),
+        )
+        .tuples()
+    }
+    count = len(skills) or 1
+    scores = [
+        (
+            id,
+            round(
+                RANK_SKILL_WEIGHT * skill_scores[seeker] / count
+                + RANK_EXAM_WEIGHT * exam_scores[seeker] / count
+                + RANK_FIT_WEIGHT * (seeker in fits),
+                2,
+            ),
+        )
+        for id, seeker in requests
+    ]
+    # ties: newest request first
+    return sorted(scores, key=lambda s: (-s[1], -s[0]))
+
+
+def ranking(job_id: int) -> tuple[int, tuple[tuple[int, float], ...]] | None:
+    """(employer id, ranked requests) of the job, None when it doesn't exist"""
+    cached = rankings.get(job_id)
+    if cached is None:
+        generation = rankings.generation
+        job = Job.get_or_none(Job.id == job_id)
+        if job is None:
+            return None
+        cached = (job.employer_id, tuple(score_requests(job)))
+        rankings.set_if_current(generation, job_id, cached, [f"job:{job_id}"])
+    return cached
+
+
+# applicants' scores change rarely and per seeker, so those writes drop the
+# rankings of every job the seeker applied to
+def _forget_seeker(seeker_id: int) -> None:
+    rankings.invalidate(
+        *(
+            f"job:{job_id}"
+            for (job_id,) in JobRequest.select(JobRequest.job)
+            .where(JobRequest.seeker == seeker_id)
+            .tuples()
+        )
+    )
+
+
+@post_save(sender=JobRequest)
+@post_delete(sender=JobRequest)
+@post_save(sender=Job)
+def _forget_job_ranking(sender, instance, *args, **kwargs):
+    job_id = instance.job_id if isinstance(instance, JobRequest) else instance.id
+    rankings.invalidate(f"job:{job_id}")
+
+
+@post_save(sender=SeekerSkill)
+@post_delete(sender=SeekerSkill)
+@post_save(sender=ExamResult)
+@post_delete(sender=ExamResult)
+def _forget_applicant_scores(sender, instance, *args, **kwargs):
+    _forget_seeker(instance.seeker_id)
+
+
+@m2m_changed(sender=Job)
+@m2m_changed(sender=Seeker)
+@m2m_changed(sender=Skill)
+@m2m_changed(sender=Personality)
+@m2m_changed(sender=JobCategory)
+def _forget_rankings(sender, instance, *args, **kwargs):
+    if isinstance(instance, Job):
+        rankings.invalidate(f"job:{instance.id}")
+    elif isinstance(instance, Seeker):
+        _forget_seeker(instance.id)
+    else:
+        rankings.clear()
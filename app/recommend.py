@@ -0,0 +1,101 @@
+import os
+
+from app.catalogue import catalogue, personalities_of
+from app.facets import facet_index
+from app.models.dbmodel import SeekerSkill
+
+RECOMMEND_LIMIT = 50
+# `SeekerSkill.score` is out of SKILL_SCORE_MAX; a matched skill weighs 1 (no
+# score) to SKILL_WEIGHT_MAX, a category of one of the seeker's personalities
+# AFFINITY_WEIGHT
+SKILL_SCORE_MAX = int(os.environ.get("SKILL_SCORE_MAX", 100))
+SKILL_WEIGHT_MAX = int(os.environ.get("SKILL_WEIGHT_MAX", 8))
+AFFINITY_WEIGHT = int(os.environ.get("AFFINITY_WEIGHT", 4))
+
+
+def skill_weight(score: int | None) -> int:
+    score = max(0, min(score or 0, SKILL_SCORE_MAX))
+    return 1 + score * (SKILL_WEIGHT_MAX - 1) // SKILL_SCORE_MAX
+
+
+def add_weighted(slices: list[int], bits: int, weight: int) -> None:
+    """
+    adds `weight` to the score of every job in `bits`. scores are bit-sliced:
+    bit i of job j's score is bit j of `slices[i]`, so an addition is a few
+    whole-bitmap ripple-carry steps rather than a loop over jobs.
+    """
+    level = 0
+    while weight:
+        if weight & 1:
+            carry, i = bits, level
+            while carry:
+                if i >= len(slices):
+                    slices.extend([0] * (i + 1 - len(slices)))
+                slices[i], carry = slices[i] ^ carry, slices[i] & carry
+                i += 1
+        weight >>= 1
+        level += 1
+
+
+def top_k(slices: list[int], candidates: int, k: int) -> int:
+    """
+    bitmap of the `k` highest scores among `candidates`, ties going to the
+    highest (newest) job ids; one pass from the top slice down
+    """
+    chosen, tied = 0, candidates
+    for bits in reversed(slices):
+        higher = chosen | (tied & bits)
+        count = higher.bit_count()
+        if count > k:
+            tied &= bits
+        elif count < k:
+            chosen, tied = higher, tied & ~bits
+        else:
+            return higher
+    for _ in range(k - chosen.bit_count()):
+        if not tied:
+            break
+        top = 1 << (tied.bit_length() - 1)
+        chosen, tied = chosen | top, tied ^ top
+    return chosen
+
+
+def set_bits(bits: int) -> list[int]:
+    ids = []
+    while bits:
+        id = bits.bit_length() - 1
+        ids.append(id)
+        bits ^= 1 << id
+    return ids
+
+
+def recommend(seeker_id: int, limit: int = RECOMMEND_LIMIT) -> list[tuple[int, int]]:
+    """(job id, score) of the seeker's best matching active jobs, best first"""
+    weights = {
+        skill: skill_weight(score)
+        for skill, score in SeekerSkill.select(SeekerSkill.skill, SeekerSkill.score)
+        .where(SeekerSkill.seeker == seeker_id)
+        .tuples()
+    }
+    categories = set()
+    for personality in personalities_of(seeker_id):
+        categories.update(catalogue.snapshot.personality_categories.get(personality, ()))
+
+    slices, candidates = [], 0
+    for skill, bits in facet_index.value_bitmaps("skill", weights).items():
+        add_weighted(slices, bits, weights[skill])
+        candidates |= bits
+    affinity = 0
+    for bits in facet_index.value_bitmaps("category", categories).values():
+        affinity |= bits
+    add_weighted(slices, affinity, AFFINITY_WEIGHT)
+    candidates |= affinity
+
+    ids = set_bits(top_k(slices, candidates, limit))
+    scores = []
+    for id, values in facet_index.job_values(ids).items():
+        score = sum(weights.get(skill, 0) for skill in values["skill"])
+        if categories.intersection(values["category"]):
+            score += AFFINITY_WEIGHT
+        scores.append((id, score))
+    return sorted(scores, key=lambda s: (-s[1], -s[0]))
@@ -0,0 +1,23 @@
+from fastapi.responses import ORJSONResponse
+import pydantic
+
+from app.models.serializers import dumps
+
+
+class SchemaJSONResponse(ORJSONResponse):
+    """orjson rendering that also takes schema objects as they are"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def schema_response(content):
+    """
+    wraps a handler's schema object so FastAPI sends it as is instead of
+    converting it to a dict, re-validating and encoding it again. only for
+    handlers that return exactly their response model; anything else (e.g.
+    None) is left to FastAPI.
+    """
+    if isinstance(content, pydantic.BaseModel):
+        return SchemaJSONResponse(content)
+    return content
@@ -1,14 +1,26 @@
 from fastapi import APIRouter, Query, Depends, Path, HTTPException, status
 from typing import Annotated, Any, Literal
-from app.models.dbmodel import User, JobCategory, Job, TABLES, Personality, Seeker
+from app.models.dbmodel import (
+    User,
+    JobCategory,
+    JobListing,
+    TABLES,
+    Seeker,
+)
+from app.models.prefetch import prefetch_schema
 from app.models.schemas import (
     JobsPage,
-    JobSchema,
+    ListedJobsPage,
     PaginationMeta,
     CategoryPage,
     JobCategorySchema,
 )
-from app.deps import get_user_or_none, Scopes
+from fastapi.responses import Response
+from app.responses import schema_response
+from app.catalogue import catalogue, suited_categories
+from app.deps import get_user_or_none, Scopes, AsyncDB
+from app.pagination import keyset_paginate, cursor_meta
+from app import listing
 from math import ceil
 from peewee import DoesNotExist
 
@@ -17,6 +29,7 @@ router = APIRouter()
 
 @router.get("/search")
 async def get_categories(
+    db: AsyncDB,
     course: Annotated[str, Query()] = None,
     expertise: Annotated[str, Query()] = None,
     min_salary: Annotated[int, Query(ge=1)] = None,
@@ -25,6 +38,40 @@ async def get_categories(
     page: Annotated[int, Query(ge=1)] = 1,
     per_page: Annotated[int, Query(le=100, ge=1)] = 10,
     user: Annotated[User | None, Depends(get_user_or_none(Scopes.seeker))] = None,
+    after: Annotated[
+        str,
+        Query(description="cursor mode: `meta.next_cursor`, or empty for first page"),
+    ] = None,
+    count: Annotated[bool, Query(description="cursor mode: include total")] = False,
+) -> CategoryPage:
+    return schema_response(
+        await db.run(
+            categories_page,
+            course,
+            expertise,
+            min_salary,
+            max_salary,
+            personality,
+            page,
+            per_page,
+            user,
+            after,
+            count,
+        )
+    )
+
+
+def categories_page(
+    course: str | None,
+    expertise: str | None,
+    min_salary: int | None,
+    max_salary: int | None,
+    personality: str | None,
+    page: int,
+    per_page: int,
+    user: User | None,
+    after: str | None,
+    count: bool,
 ) -> CategoryPage:
     q = JobCategory.slug == JobCategory.slug
     if course:
@@ -39,10 +86,30 @@ async def get_categories(
         q &= JobCategory.max_salary >= max_salary
 
     if user and personality:
-        seeker = user.seeker
-        personality = Personality.get_by_id(personality)  # TODO: Error handle
-        if personality >> seeker.personalities:
-            q &= personality >> JobCategory.personalities
+        if personality not in catalogue.snapshot.personalities:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST, detail="invalid personality id"
+            )
+        slugs = suited_categories(personality, user.seeker_id)
+        if slugs is not None:
+            q &= JobCategory.slug.in_(slugs)
+
+    if after is not None:
+        query = JobCategory.select().where(q)
+        categories, next_cursor = keyset_paginate(
+            query,
+            (JobCategory.slug,),
+            after,
+            per_page,
+            JobCategorySchema,
+            descending=False,
+        )
+        if not categories and not after:
+            raise HTTPException(status.HTTP_204_NO_CONTENT)
+        return CategoryPage(
+            meta=cursor_meta(query, per_page, next_cursor, count),
+            categories=[c.to_schema(JobCategorySchema) for c in categories],
+        )
 
     count = JobCategory.select().where(q).count()
     if count == 0:
@@ -58,50 +125,80 @@ async def get_categories(
             ),
             categories=[
                 j.to_schema(JobCategorySchema)
-                for j in JobCategory.select().where(q).paginate(page, per_page)
+                for j in prefetch_schema(
+                    JobCategory.select().where(q).paginate(page, per_page),
+                    JobCategorySchema,
+                )
             ],
         )
     else:
-        HTTPException(400, "bad_pagination")
+        raise HTTPException(400, "bad_pagination")
 
 
 @router.get("/{slug}/jobs")
 async def get_category_jobs(
     slug: Annotated[str, Path()],
+    db: AsyncDB,
     page: Annotated[int, Query(ge=1)] = 1,
     per_page: Annotated[int, Query(le=100, ge=1)] = 10,
+    after: Annotated[
+        str,
+        Query(description="cursor mode: `meta.next_cursor`, or empty for first page"),
+    ] = None,
+    count: Annotated[bool, Query(description="cursor mode: include total")] = False,
 ) -> JobsPage:
+    return schema_response(
+        await db.run(category_jobs_page, slug, page, per_page, after, count)
+    )
+
+
+def category_jobs_page(
+    slug: str, page: int, per_page: int, after: str | None, count: bool
+) -> ListedJobsPage:
     try:
-        category = JobCategory.get_by_id(slug)
-        jobs_count = category.jobs.select(Job.expired == False).count()
+        if slug not in catalogue.snapshot.categories:
+            raise DoesNotExist
+        query = JobListing.select().where(
+            JobListing.category == slug, JobListing.active()
+        )
+        if after is not None:
+            rows, next_cursor = keyset_paginate(
+                query, (JobListing.created_on, JobListing.job), after, per_page
+            )
+            return ListedJobsPage.construct(
+                meta=cursor_meta(query, per_page, next_cursor, count),
+                jobs=[listing.render(row) for row in rows],
+            )
+
+        jobs_count = query.count()
+        if jobs_count == 0:
+            raise HTTPException(status.HTTP_204_NO_CONTENT)
         pages_count = ceil(jobs_count / per_page)
         if page <= pages_count:
-            jobs: list[JobSchema] = []
-            for job in (
-                Job.select()
-                .where(Job.expired == False)
-                .order_by(-Job.created_on)
-                .paginate(page, per_page)
-            ):
-                jobs.append(job.to_schema(JobSchema))
-            return JobsPage(
+            rows = query.order_by(-JobListing.created_on).paginate(page, per_page)
+            return ListedJobsPage.construct(
                 meta=PaginationMeta(
                     total_count=jobs_count,
                     current_page=page,
                     page_count=pages_count,
                     per_page=per_page,
                 ),
-                jobs=jobs,
+                jobs=[listing.render(row) for row in rows],
             )
         else:
-            HTTPException(400, "bad_pagination")
+            raise HTTPException(400, "bad_pagination")
     except DoesNotExist:
-        HTTPException(404)
+        raise HTTPException(404)
 
 
 @router.get("/{slug}")
-async def get_category(slug: Annotated[str, Path()]):
-    try:
-        return JobCategory.get_by_id(slug).to_schema(JobCategorySchema)
-    except DoesNotExist:
+async def get_category(slug: Annotated[str, Path()], db: AsyncDB):
+    return schema_response(await db.run(category_detail, slug))
+
+
+def category_detail(slug: str) -> Response:
+    body = catalogue.snapshot.category_bodies.get(slug)
+    if body is None:
         raise HTTPException(status_code=404)
+    # prebuilt with the catalogue snapshot
+    return Response(body, media_type="application/json")
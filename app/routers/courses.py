@@ -5,7 +5,8 @@ from typing import Annotated
 from pydantic import PositiveInt
 from app.models.schemas import JobsPage, JobSchema, PaginationMeta
 from app.models.dbmodel import Course
-from app.deps import get_user_or_none, Scopes
+from app.deps import get_user_or_none, Scopes, AsyncDB
+from app.clicks import click_counter, course_links
 from peewee import DoesNotExist
 
 router = APIRouter()
@@ -16,12 +17,18 @@ router = APIRouter()
     response_class=RedirectResponse,
     response_description="Redirect to course link",
 )
-async def get_course(slug: Annotated[str, Path]):
+async def get_course(slug: Annotated[str, Path], db: AsyncDB):
+    link = course_links.get(slug)
+    if link is None:
+        link = await db.run(course_link, slug)
+        course_links.set(slug, link)
+    click_counter.add(slug)
+    return RedirectResponse(link)
+
+
+def course_link(slug: str) -> str:
     try:
-        course = Course.get_by_id(slug)
-        course.clicks += 1
-        course.save()
-        return RedirectResponse(course.link)
+        return Course.select(Course.link).where(Course.slug == slug).get().link
     except DoesNotExist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="course.not_found"
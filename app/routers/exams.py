@@ -2,12 +2,17 @@ from peewee import DoesNotExist
 from app.models.dbmodel import Exam
 from fastapi import APIRouter, Query, HTTPException, status
 from typing import Annotated
+from app.deps import AsyncDB
 
 router = APIRouter()
 
 
 @router.get("/{id}")
-async def get_exam(id: Annotated[int, Query()]):
+async def get_exam(id: Annotated[int, Query()], db: AsyncDB):
+    return await db.run(exam_detail, id)
+
+
+def exam_detail(id: int):
     try:
         Exam.get_by_id(id)
     except DoesNotExist:
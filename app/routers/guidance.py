@@ -1,7 +1,13 @@
 from fastapi import APIRouter, Depends, Query, Path, HTTPException, status, Security
-from app.deps import get_user_or_none, Scopes
+from fastapi.responses import Response
+from app.responses import schema_response
+from app.guides import guide_bodies, guide_tags
+from app.models.prefetch import prefetch_schema
+from app.models.serializers import dumps
+from app.catalogue import catalogue, suited_categories
+from app.deps import get_user_or_none, Scopes, AsyncDB
 from typing import Annotated, Literal
-from app.models.dbmodel import Guide, User, JobCategory, Personality, ForeignGuideMeta
+from app.models.dbmodel import Guide, User, JobCategory, ForeignGuideMeta
 from app.models.schemas import (
     GuideItem,
     GuideSchema,
@@ -13,37 +19,60 @@ from app.models.schemas import (
     Grade,
 )
 from ordered_set import OrderedSet
-from peewee import IntegrityError
+from peewee import fn
 from pydantic import PositiveInt
 from math import ceil
 
 router = APIRouter()
 
 
-def get_guides(query, page, per_page):
-    count = JobCategory.select().where(query).count()
-    if count == 0:
+def guide_page(source, where, page: int, per_page: int) -> GuidesPage:
+    """
+    one page of the guides joined to `source` (`JobCategory` or
+    `ForeignGuideMeta`) that match `where`. the total is a window count on
+    the same statement, so a page is a single query whatever it holds.
+    """
+    guides = Guide.select().join(source).where(where)
+    rows = list(
+        guides.select(Guide.slug, Guide.title, Guide.summary, fn.COUNT(1).over())
+        .order_by(Guide.slug)
+        .paginate(page, per_page)
+        .tuples()
+    )
+    if not rows:
+        if page > 1 and guides.exists():
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "bad_pagination")
         raise HTTPException(status.HTTP_204_NO_CONTENT)
-    pages_count = ceil(count / per_page)
-    if page <= pages_count:
-        guides = []
-        for jc in JobCategory.select().where(query).paginate(page, per_page):
-            guides.extend([guide.to_schema(GuideItem) for guide in jc.guides])
-        return GuidesPage(
-            meta=PaginationMeta(
-                total_count=count,
-                current_page=page,
-                page_count=pages_count,
-                per_page=per_page,
-            ),
-            guides=guides,
-        )
-    else:
-        HTTPException(400, "bad_pagination")
+    count = rows[0][3]
+    return GuidesPage.construct(
+        meta=PaginationMeta(
+            total_count=count,
+            current_page=page,
+            page_count=ceil(count / per_page),
+            per_page=per_page,
+        ),
+        guides=[
+            GuideItem.construct(slug=slug, title=title, summary=summary)
+            for slug, title, summary, _ in rows
+        ],
+    )
+
+
+def search_guides(query, user: User | None, personality: str | None, page, per_page):
+    if user and personality:
+        if personality not in catalogue.snapshot.personalities:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST, detail="invalid personality id"
+            )
+        slugs = suited_categories(personality, user.seeker_id)
+        if slugs is not None:
+            query &= JobCategory.slug.in_(slugs)
+    return guide_page(JobCategory, query, page, per_page)
 
 
 @router.get("/search/1", summary="I know Expertise I love")
 async def search1(
+    db: AsyncDB,
     course: Annotated[str, Query()],
     expertise: Annotated[str, Query()] = None,
     personality: Annotated[str, Query()] = None,
@@ -56,22 +85,14 @@ async def search1(
     q = JobCategory.course == course
     if expertise:
         q &= JobCategory.expertise == expertise
-
-    if user and personality:
-        seeker = user.seeker
-        try:
-            personality = Personality.get_by_id(personality)
-            if personality >> seeker.personalities:
-                q &= personality >> JobCategory.personalities
-        except:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST, detail="invalid personality id"
-            )
-    return get_guides(q, page, per_page)
+    return schema_response(
+        await db.run(search_guides, q, user, personality, page, per_page)
+    )
 
 
 @router.get("/search/2", summary="Search to find my Expertise")
 async def search2(
+    db: AsyncDB,
     fav: Annotated[list[str], Query(description="User favorite courses")],
     salary: Annotated[
         tuple[int, int], Query(description="minimum and maximum salary")
@@ -84,30 +105,22 @@ async def search2(
     ] = 10,
     user: Annotated[User | None, Depends(get_user_or_none(Scopes.seeker))] = None,
 ) -> GuidesPage:
-    query = JobCategory.course >> fav
+    query = JobCategory.course.in_(fav)
     if salary:
-        query &= (
-            JobCategory.min_salary >= salary[0] & JobCategory.max_salary <= salary[1]
+        query &= (JobCategory.min_salary >= salary[0]) & (
+            JobCategory.max_salary <= salary[1]
         )
     if type_:
         query &= JobCategory.type == type_
 
-    if user and personality:
-        seeker = user.seeker
-        try:
-            personality = Personality.get_by_id(personality)
-            if personality >> seeker.personalities:
-                query &= personality >> JobCategory.personalities
-        except:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST, detail="invalid personality id"
-            )
-
-    return get_guides(query, page, per_page)
+    return schema_response(
+        await db.run(search_guides, query, user, personality, page, per_page)
+    )
 
 
 @router.get("/search/3", summary="Search for guidance in Iran")
 async def search3(
+    db: AsyncDB,
     course: Annotated[str, Query()],
     salary: Annotated[tuple[int, int], Query()] = None,
     type_: Annotated[JobType, Query(alias="type")] = None,
@@ -120,28 +133,20 @@ async def search3(
 ) -> GuidesPage:
     query = JobCategory.course == course
     if salary:
-        query &= (
-            JobCategory.min_salary >= salary[0] & JobCategory.max_salary <= salary[1]
+        query &= (JobCategory.min_salary >= salary[0]) & (
+            JobCategory.max_salary <= salary[1]
         )
     if type_:
         query &= JobCategory.type == type_
 
-    if user and personality:
-        seeker = user.seeker
-        try:
-            personality = Personality.get_by_id(personality)
-            if personality >> seeker.personalities:
-                query &= personality >> JobCategory.personalities
-        except:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST, detail="invalid personality id"
-            )
-
-    return get_guides(query, page, per_page)
+    return schema_response(
+        await db.run(search_guides, query, user, personality, page, per_page)
+    )
 
 
 @router.get("/search/4", summary="Search for foreign guidance")
 async def search4(
+    db: AsyncDB,
     course: Annotated[str, Query()],
     grade: Annotated[Grade, Query()] = None,
     motivation: Annotated[ForeignGuideMotivation, Query] = None,
@@ -155,35 +160,38 @@ async def search4(
         q &= ForeignGuideMeta.grade == grade
     if motivation:
         q &= ForeignGuideMeta.motivation == motivation
+    return schema_response(await db.run(foreign_guides, q, page, per_page))
 
-    count = ForeignGuideMeta.select().where(q).count()
-    if count == 0:
-        raise HTTPException(status.HTTP_204_NO_CONTENT)
-    pages_count = ceil(count / per_page)
-    if page <= pages_count:
-        guides = []
-        for fgm in ForeignGuideMeta.select().where(q).paginate(page, per_page):
-            guides.extend([guide.to_schema(GuideItem) for guide in fgm.guides])
-        return GuidesPage(
-            meta=PaginationMeta(
-                total_count=count,
-                current_page=page,
-                page_count=pages_count,
-                per_page=per_page,
-            ),
-            guides=guides,
-        )
-    else:
-        HTTPException(400, "bad_pagination")
 
+def foreign_guides(q, page, per_page) -> GuidesPage:
+    return guide_page(ForeignGuideMeta, q, page, per_page)
 
-@router.get("/{slug}")
-async def get_guide(slug: Annotated[str, Path()]) -> GuideSchema:
-    try:
-        if slug:
-            return Guide.get(Guide.slug == slug).to_schema(GuideSchema)
-        raise HTTPException(status.HTTP_400_BAD_REQUEST)
-    except IntegrityError:
+
+@router.get("/{slug}", response_model=GuideSchema)
+async def get_guide(slug: Annotated[str, Path()], db: AsyncDB):
+    body = guide_bodies.get(slug)
+    if body is None:
+        body = await db.run(guide_body, slug)
+    return Response(body, media_type="application/json")
+
+
+def load_guide(slug: str) -> Guide:
+    """the guide with its category and whole roadmap, in a fixed 6 queries"""
+    guides = prefetch_schema(Guide.select().where(Guide.slug == slug), GuideSchema)
+    if not guides:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="guide.not_found"
         )
+    return guides[0]
+
+
+def guide_detail(slug: str) -> GuideSchema:
+    return load_guide(slug).to_schema(GuideSchema)
+
+
+def guide_body(slug: str) -> bytes:
+    generation = guide_bodies.generation
+    guide = load_guide(slug)
+    body = dumps(guide.to_schema(GuideSchema))
+    guide_bodies.set_if_current(generation, slug, body, guide_tags(guide))
+    return body
@@ -1,10 +1,32 @@
 from fastapi import APIRouter, Path, HTTPException, status, Query, Depends, Security
 from math import ceil
 from typing import Annotated
-from peewee import DoesNotExist
-from app.models.schemas import Role, JobRequestSchema, JobRequestPage, PaginationMeta
-from app.models.dbmodel import JobRequest, User, Job, TABLES, Employer
-from app.deps import get_current_user, Scopes
+from peewee import IntegrityError
+from app.models.schemas import (
+    Role,
+    ExportFormat,
+    JobRequestSchema,
+    JobRequestPage,
+    PaginationMeta,
+    RankedJobRequest,
+    RankedJobRequestPage,
+)
+from app.models.dbmodel import (
+    JobRequest,
+    User,
+    Job,
+    TABLES,
+    Seeker,
+    database_proxy,
+)
+from app.models.prefetch import prefetch_schema
+from app.responses import schema_response
+from app.deps import get_current_user, Scopes, AsyncDB
+from app.pagination import keyset_paginate, cursor_meta
+from app.database import iterate
+from app.exports import chunks, export_response
+from app.quota import take_request_slot
+from app.ranking import ranking
 
 from datetime import datetime, timedelta
 
@@ -15,51 +37,144 @@ router = APIRouter()
 async def new_request(
     job_id: int,
     user: Annotated[User, Security(get_current_user, scopes=Scopes.seeker)],
+    db: AsyncDB,
 ):
-    try:
-        seeker = user.seeker
-        if seeker.req_lim_count < 5:
-            seeker.req_lim_count += 1
-            if seeker.req_lim_count == 1:
-                seeker.req_lim_date = datetime.now()
+    return await db.run(create_request, job_id, user)
+
+
+def create_request(job_id: int, user: User):
+    # all or nothing: a refused request neither uses quota nor counts
+    with database_proxy.atomic():
+        if not (
+            Job.update(requests_count=Job.requests_count + 1)
+            .where(Job.id == job_id, Job.active())
+            .execute()
+        ):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST)
+        if not take_request_slot(user.seeker_id):
+            raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, "user.job")
+        try:
             JobRequest.create(
-                job=Job.get_by_id(job_id),
-                seeker=seeker,
+                job=job_id,
+                seeker=user.seeker_id,
                 expire_on=datetime.now() + timedelta(30),
             )
-        else:
-            raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, "user.job")
-    except DoesNotExist:
-        raise HTTPException(status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            raise HTTPException(status.HTTP_409_CONFLICT, "request.duplicate")
+
+
+REQUEST_EXPORT_COLUMNS = [
+    "id",
+    "created_on",
+    "expire_on",
+    "state",
+    "job_id",
+    "job_title",
+    "seeker_id",
+    "firstname",
+    "lastname",
+]
+
+
+@router.get("/export")
+async def export_requests(
+    user: Annotated[User, Security(get_current_user)],
+    db: AsyncDB,
+    format: ExportFormat = ExportFormat.ndjson,
+):
+    """every job request `GET /requests/` would page through, streamed"""
+    requests_scope(user)
+    return export_response(
+        db, request_rows, user, format, format=format, filename="requests"
+    )
+
+
+def request_rows(user: User, format: ExportFormat):
+    query = (
+        JobRequest.select(
+            JobRequest.id,
+            JobRequest.created_on,
+            JobRequest.expire_on,
+            JobRequest.state,
+            Job.id.alias("job_id"),
+            Job.title.alias("job_title"),
+            Seeker.id.alias("seeker_id"),
+            Seeker.firstname,
+            Seeker.lastname,
+        )
+        .join(Job)
+        .switch(JobRequest)
+        .join(Seeker)
+        .where(requests_scope(user))
+        .order_by(JobRequest.id)
+        .dicts()
+    )
+    return chunks(iterate(query), REQUEST_EXPORT_COLUMNS, format)
 
 
 @router.get("/")
 async def get_requests(
     user: Annotated[User, Security(get_current_user)],
+    db: AsyncDB,
     page: Annotated[int, Query(ge=1)] = 1,
     per_page: Annotated[int, Query(le=50, ge=1)] = 10,
-) -> JobRequestPage:
-    if user.role == Role.employer:
-        employer = user.employer
-        query = (
-            JobRequest.select()
-            .join(Job)
-            .join(Employer)
-            .where(Employer.id == employer.id)
-            .order_by(-JobRequest.created_on)
-            .paginate(page, per_page)
+    after: Annotated[
+        str,
+        Query(description="cursor mode: `meta.next_cursor`, or empty for first page"),
+    ] = None,
+    count: Annotated[bool, Query(description="cursor mode: include total")] = False,
+    job: Annotated[int, Query(description="only the requests for this job")] = None,
+    rank: Annotated[
+        bool,
+        Query(description="employers, with `job`: best matching candidates first"),
+    ] = False,
+) -> JobRequestPage | RankedJobRequestPage:
+    if rank:
+        return schema_response(
+            await db.run(ranked_requests_page, user, job, page, per_page)
         )
+    return schema_response(
+        await db.run(requests_page, user, page, per_page, after, count, job)
+    )
+
+
+def requests_scope(user: User):
+    """the job requests `user` may see, over `JobRequest` joined to `Job`"""
+    if user.role == Role.employer:
+        return Job.employer == user.employer_id
     elif user.role == Role.seeker:
-        seeker = user.seeker
-        query = (
-            JobRequest.select()
-            .where(JobRequest.seeker == seeker.id)
-            .order_by(-JobRequest.created_on)
-            .paginate(page, per_page)
-        )
+        return JobRequest.seeker == user.seeker_id
     else:
         raise Exception("Unknown user?!")
 
+
+def requests_page(
+    user: User,
+    page: int,
+    per_page: int,
+    after: str | None,
+    count: bool,
+    job: int | None = None,
+) -> JobRequestPage:
+    query = JobRequest.select().join(Job).where(requests_scope(user))
+    if job is not None:
+        query = query.where(JobRequest.job == job)
+
+    if after is not None:
+        requests, next_cursor = keyset_paginate(
+            query,
+            (JobRequest.created_on, JobRequest.id),
+            after,
+            per_page,
+            JobRequestSchema,
+        )
+        if not requests and not after:
+            raise HTTPException(status.HTTP_204_NO_CONTENT)
+        return JobRequestPage(
+            meta=cursor_meta(query, per_page, next_cursor, count),
+            requests=[jr.to_schema(JobRequestSchema) for jr in requests],
+        )
+
     count = query.count()
     if count == 0:
         raise HTTPException(status.HTTP_204_NO_CONTENT)
@@ -72,5 +187,50 @@ async def get_requests(
                 current_page=page,
                 page_count=pages_count,
             ),
-            requests=[jr.to_schema(JobRequestSchema) for jr in query],
+            requests=[
+                jr.to_schema(JobRequestSchema)
+                for jr in prefetch_schema(
+                    query.order_by(-JobRequest.created_on).paginate(page, per_page),
+                    JobRequestSchema,
+                )
+            ],
+        )
+
+
+def ranked_requests_page(
+    user: User, job: int | None, page: int, per_page: int
+) -> RankedJobRequestPage:
+    if user.role != Role.employer:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+    if job is None:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "request.job_required")
+    ranked = ranking(job)
+    if ranked is None or ranked[0] != user.employer_id:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "job.not_found")
+    scores = ranked[1]
+    if not scores:
+        raise HTTPException(status.HTTP_204_NO_CONTENT)
+    pages_count = ceil(len(scores) / per_page)
+    if page > pages_count:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "bad_pagination")
+    scores = scores[(page - 1) * per_page : page * per_page]
+    requests = {
+        jr.id: jr
+        for jr in prefetch_schema(
+            JobRequest.select().where(JobRequest.id.in_([id for id, _ in scores])),
+            JobRequestSchema,
         )
+    }
+    return RankedJobRequestPage.construct(
+        meta=PaginationMeta(
+            total_count=len(ranked[1]),
+            per_page=per_page,
+            current_page=page,
+            page_count=pages_count,
+        ),
+        requests=[
+            requests[id].to_schema(RankedJobRequest, score=score)
+            for id, score in scores
+            if id in requests
+        ],
+    )
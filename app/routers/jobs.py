@@ -1,49 +1,271 @@
-from fastapi import APIRouter, Path, HTTPException, status, Query, Depends
+from fastapi import APIRouter, Path, HTTPException, status, Query, Depends, Security
 from math import ceil
+from peewee import fn
 from typing import Annotated
 from pydantic import PositiveInt
-from app.models.schemas import JobsPage, JobSchema, PaginationMeta
-from app.models.dbmodel import Job, User, TABLES
-from app.deps import get_user_or_none, Scopes
+from app.models.schemas import (
+    FacetCount,
+    ExportFormat,
+    FacetedJobsPage,
+    JobFacets,
+    JobsPage,
+    ListedJobsPage,
+    JobSchema,
+    PaginationMeta,
+    SalaryRange,
+)
+from app.models.dbmodel import Employer, Job, JobIndex, JobListing, User, TABLES
+from app.models.prefetch import prefetch_schema
+from app.responses import schema_response
+from app.deps import get_current_user, get_user_or_none, Scopes, AsyncDB
+from app.database import iterate
+from app.exports import chunks, export_response
+from app.pagination import keyset_paginate, cursor_meta
+from app import listing, search
+from app.facets import facet_index, salary_condition
 
 router = APIRouter()
 
 
 @router.get("/")
 async def get_jobs(
+    db: AsyncDB,
     page: Annotated[int, Query(ge=1)] = 1,
     per_page: Annotated[int, Query(le=100, ge=1)] = 10,
+    after: Annotated[
+        str,
+        Query(description="cursor mode: `meta.next_cursor`, or empty for first page"),
+    ] = None,
+    count: Annotated[bool, Query(description="cursor mode: include total")] = False,
 ) -> JobsPage:
-    count = Job.select().where(Job.expired == False).count()
+    return schema_response(await db.run(jobs_page, page, per_page, after, count))
+
+
+def jobs_page(
+    page: int, per_page: int, after: str | None, count: bool
+) -> ListedJobsPage:
+    # rendered jobs from the `JobListing` read model, one row per job
+    query = JobListing.select().where(JobListing.active())
+    if after is not None:
+        rows, next_cursor = keyset_paginate(
+            query, (JobListing.created_on, JobListing.job), after, per_page
+        )
+        if not rows and not after:
+            raise HTTPException(status.HTTP_204_NO_CONTENT)
+        return ListedJobsPage.construct(
+            meta=cursor_meta(query, per_page, next_cursor, count),
+            jobs=[listing.render(row) for row in rows],
+        )
+
+    count = query.count()
     if count == 0:
         raise HTTPException(status.HTTP_204_NO_CONTENT)
     pages_count = ceil(count / per_page)
     if page <= pages_count:
-        jobs: list[JobSchema] = []
-        for job in (
-            Job.select()
-            .where(Job.expired == False)
-            .order_by(-Job.created_on)
-            .paginate(page, per_page)
-        ):
-            jobs.append(job.to_schema(JobSchema))
-        return JobsPage(
+        rows = query.order_by(-JobListing.created_on).paginate(page, per_page)
+        return ListedJobsPage.construct(
             meta=PaginationMeta(
                 total_count=count,
                 current_page=page,
                 page_count=pages_count,
                 per_page=per_page,
             ),
-            jobs=jobs,
+            jobs=[listing.render(row) for row in rows],
         )
     else:
-        HTTPException(400, "bad_pagination")
+        raise HTTPException(400, "bad_pagination")
+
+
+@router.get("/search")
+async def search_jobs(
+    db: AsyncDB,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    page: Annotated[int, Query(ge=1)] = 1,
+    per_page: Annotated[int, Query(le=100, ge=1)] = 10,
+) -> JobsPage:
+    return schema_response(await db.run(search_page, q, page, per_page))
+
+
+def search_page(q: str, page: int, per_page: int) -> JobsPage:
+    if not search.enabled():
+        raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, "search.unavailable")
+    match = search.match_expression(q)
+    if match is None:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "bad_query")
+    # counts jobs that expired since the last sweep too, pages filter them out
+    count = JobIndex.select().where(JobIndex.match(match)).count()
+    if count == 0:
+        raise HTTPException(status.HTTP_204_NO_CONTENT)
+    pages_count = ceil(min(count, search.SEARCH_CANDIDATES) / per_page)
+    if page > pages_count:
+        raise HTTPException(400, "bad_pagination")
+    candidates = (
+        JobIndex.select(JobIndex.rowid, JobIndex.bm25(*search.WEIGHTS).alias("score"))
+        .where(JobIndex.match(match))
+        .order_by(JobIndex.rowid.desc())
+        .limit(search.SEARCH_CANDIDATES)
+        .alias("candidates")
+    )
+    ranked = (
+        Job.select(Job.id)
+        .join(candidates, on=(Job.id == candidates.c.rowid))
+        .where(Job.active())
+        .order_by(candidates.c.score, Job.created_on.desc())
+        .paginate(page, per_page)
+    )
+    ids = [job.id for job in ranked]
+    jobs = {
+        job.id: job
+        for job in prefetch_schema(Job.select().where(Job.id.in_(ids)), JobSchema)
+    }
+    return JobsPage(
+        meta=PaginationMeta(
+            total_count=count,
+            current_page=page,
+            page_count=pages_count,
+            per_page=per_page,
+        ),
+        jobs=[jobs[id].to_schema(JobSchema) for id in ids if id in jobs],
+    )
+
+
+@router.get("/filter")
+async def filter_jobs(
+    db: AsyncDB,
+    city: Annotated[list[str], Query()] = [],
+    category: Annotated[list[str], Query(description="category slugs")] = [],
+    skill: Annotated[list[str], Query(description="skill slugs")] = [],
+    type: Annotated[list[str], Query()] = [],
+    salary: Annotated[list[SalaryRange], Query()] = [],
+    page: Annotated[int, Query(ge=1)] = 1,
+    per_page: Annotated[int, Query(le=100, ge=1)] = 10,
+) -> FacetedJobsPage:
+    """values of a facet are OR-ed, facets are AND-ed"""
+    filters = dict(
+        city=city, category=category, skill=skill, type=type, salary=salary
+    )
+    return schema_response(await db.run(filter_page, filters, page, per_page))
+
+
+def filter_page(filters: dict[str, list], page: int, per_page: int):
+    query = Job.select().where(Job.active())
+    if filters["city"]:
+        query = query.join(Employer).where(Employer.city.in_(filters["city"]))
+    if filters["category"]:
+        query = query.where(Job.category.in_(filters["category"]))
+    if filters["type"]:
+        query = query.where(Job.type.in_(filters["type"]))
+    if filters["salary"]:
+        query = query.where(salary_condition(filters["salary"]))
+    if filters["skill"]:
+        JobSkill = Job.skills.get_through_model()
+        query = query.where(
+            fn.EXISTS(
+                JobSkill.select(JobSkill.id).where(
+                    JobSkill.job == Job.id, JobSkill.skill.in_(filters["skill"])
+                )
+            )
+        )
+    # the total pages the same rows the page is cut from; only the facet
+    # counts come from this worker's bitmaps
+    count = query.count()
+    if count == 0:
+        raise HTTPException(status.HTTP_204_NO_CONTENT)
+    pages_count = ceil(count / per_page)
+    if page > pages_count:
+        raise HTTPException(400, "bad_pagination")
+    _, facets = facet_index.counts(
+        {
+            facet: [getattr(v, "value", v) for v in values]
+            for facet, values in filters.items()
+        }
+    )
+    jobs = [
+        job.to_schema(JobSchema)
+        for job in prefetch_schema(
+            query.order_by(-Job.created_on).paginate(page, per_page), JobSchema
+        )
+    ]
+    return FacetedJobsPage(
+        meta=PaginationMeta(
+            total_count=count,
+            current_page=page,
+            page_count=pages_count,
+            per_page=per_page,
+        ),
+        jobs=jobs,
+        facets=JobFacets(
+            **{
+                facet: [FacetCount(value=value, count=n) for value, n in counts]
+                for facet, counts in facets.items()
+            }
+        ),
+    )
+
+
+JOB_EXPORT_COLUMNS = [
+    "id",
+    "title",
+    "category",
+    "type",
+    "day_time",
+    "min_salary",
+    "max_salary",
+    "requests_count",
+    "created_on",
+    "expire_on",
+    "employer_id",
+    "co_name",
+    "city",
+]
+
+
+@router.get("/export")
+async def export_jobs(
+    user: Annotated[User, Security(get_current_user, scopes=Scopes.admin)],
+    db: AsyncDB,
+    format: ExportFormat = ExportFormat.ndjson,
+):
+    """the active job catalogue, streamed"""
+    return export_response(db, job_rows, format, format=format, filename="jobs")
+
+
+def job_rows(format: ExportFormat):
+    query = (
+        Job.select(
+            Job.id,
+            Job.title,
+            Job.category,
+            Job.type,
+            Job.day_time,
+            Job.min_salary,
+            Job.max_salary,
+            Job.requests_count,
+            Job.created_on,
+            Job.expire_on,
+            Employer.id.alias("employer_id"),
+            Employer.co_name,
+            Employer.city,
+        )
+        .join(Employer)
+        .where(Job.active())
+        .order_by(Job.id)
+        .dicts()
+    )
+    return chunks(iterate(query), JOB_EXPORT_COLUMNS, format)
 
 
 @router.get("/{job_id}")
 async def get_jobs(
-    job_id: Annotated[int, Path(title="The ID of the job to get", ge=1)]
+    job_id: Annotated[int, Path(title="The ID of the job to get", ge=1)],
+    db: AsyncDB,
 ) -> JobSchema:
-    if (job := Job.get_or_none(job_id)) is not None and not job.expired:
+    return schema_response(await db.run(job_detail, job_id))
+
+
+def job_detail(job_id: int) -> JobSchema:
+    for job in prefetch_schema(
+        Job.select().where(Job.id == job_id, Job.active()), JobSchema
+    ):
         return job.to_schema(JobSchema)
     raise HTTPException(status.HTTP_404_NOT_FOUND, "job.not_found")
@@ -1,15 +1,16 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
 from app.models.schemas import BranchInfo
-from app.literals import *
+from app.catalogue import BRANCHES_BODY, CITIES_BODY
 
 router = APIRouter()
 
 
-@router.get("/cities")
-def get_cities() -> list[str]:
-    return CITIES
+@router.get("/cities", response_model=list[str])
+def get_cities():
+    return Response(CITIES_BODY, media_type="application/json")
 
 
-@router.get("/branches")
-def get_branches() -> list[BranchInfo]:
-    return [BranchInfo(**b) for b in BRANCHES]
+@router.get("/branches", response_model=list[BranchInfo])
+def get_branches():
+    return Response(BRANCHES_BODY, media_type="application/json")
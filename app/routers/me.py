@@ -1,8 +1,19 @@
 from fastapi import APIRouter, Security, Depends, Response, status, HTTPException
-from app.models.schemas import MyInfoSchema, PersonalitySchema, UpdateUserInfo, Role
-from app.models.dbmodel import User
-from app.deps import get_current_user, Scopes, sudo_access
+from app.models.schemas import (
+    MyInfoSchema,
+    PersonalitySchema,
+    RecommendedJob,
+    RecommendedJobs,
+    UpdateUserInfo,
+    Role,
+)
+from app.models.dbmodel import JobListing, User
+from app.deps import get_current_user, Scopes, sudo_access, AsyncDB
 from app.literals import CITIES
+from app.passwords import hasher
+from app.recommend import recommend
+from app.responses import schema_response
+from app import listing
 from typing import Annotated
 
 
@@ -11,9 +22,10 @@ router = APIRouter()
 
 @router.get("/")
 async def get_me(
-    current_user: Annotated[User, Security(get_current_user, scopes=Scopes.me)]
+    current_user: Annotated[User, Security(get_current_user, scopes=Scopes.me)],
+    db: AsyncDB,
 ) -> MyInfoSchema:
-    return current_user.to_schema(MyInfoSchema)
+    return await db.run(current_user.to_schema, MyInfoSchema)
 
 
 @router.put(
@@ -28,12 +40,20 @@ async def update_profile(
     sudo_access: Annotated[bool, Depends(sudo_access)],
     data: UpdateUserInfo,
     response: Response,
+    db: AsyncDB,
 ) -> MyInfoSchema:
     if data.password != data.password_confirm:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="password mismatch")
+    pass_hash = await hasher.hash(data.password)
+    return await db.run(save_profile, user, data, pass_hash, response)
+
+
+def save_profile(
+    user: User, data: UpdateUserInfo, pass_hash: str, response: Response
+) -> MyInfoSchema:
     user.email = data.email
     user.phone_number = data.phone_number
-    user.pass_hash = User.hash_password(data.password)
+    user.pass_hash = pass_hash
     s = user.save() == 1
     if user.role == Role.employer:
         employer = user.employer
@@ -55,8 +75,39 @@ async def update_profile(
 async def get_personalities(
     current_user: Annotated[
         User, Security(get_current_user, scopes=Scopes.me + Scopes.seeker)
-    ]
+    ],
+    db: AsyncDB,
 ) -> list[PersonalitySchema]:
-    return list(
-        map(lambda x: x.to_schema(PersonalitySchema), current_user.seeker.select())
-    )
+    return await db.run(seeker_personalities, current_user)
+
+
+def seeker_personalities(user: User) -> list[PersonalitySchema]:
+    return [p.to_schema(PersonalitySchema) for p in user.seeker.personalities]
+
+
+@router.get("/recommended-jobs")
+async def get_recommended_jobs(
+    current_user: Annotated[
+        User, Security(get_current_user, scopes=Scopes.me + Scopes.seeker)
+    ],
+    db: AsyncDB,
+) -> RecommendedJobs:
+    return schema_response(await db.run(recommended_jobs, current_user))
+
+
+def recommended_jobs(user: User) -> RecommendedJobs:
+    scores = recommend(user.seeker_id)
+    rows = {
+        row.job_id: row
+        for row in JobListing.select().where(
+            JobListing.job.in_([id for id, _ in scores])
+        )
+    }
+    jobs = [
+        RecommendedJob.construct(score=score, job=listing.render(rows[id]))
+        for id, score in scores
+        if id in rows
+    ]
+    if not jobs:
+        raise HTTPException(status.HTTP_204_NO_CONTENT)
+    return RecommendedJobs.construct(jobs=jobs)
@@ -3,12 +3,18 @@ from app.models.schemas import EmployerSchema
 from app.models.dbmodel import User, Role
 from peewee import DoesNotExist
 from typing import Annotated
+from app.responses import schema_response
+from app.deps import AsyncDB
 
 router = APIRouter()
 
 
 @router.get("/employer/{id}")
-async def get_user_info(id: Annotated[str, Path]) -> EmployerSchema:
+async def get_user_info(id: Annotated[str, Path], db: AsyncDB) -> EmployerSchema:
+    return schema_response(await db.run(employer_info, id))
+
+
+def employer_info(id: str) -> EmployerSchema:
     try:
         user = User.get_by_id(id)
         if user.role == Role.employer and user.visible and not user.disabled:
@@ -0,0 +1,149 @@
+from datetime import datetime
+from playhouse.signals import post_save, post_delete
+import os
+import re
+
+from app.models.dbmodel import (
+    Job,
+    JobIndex,
+    Skill,
+    SqliteDatabase,
+    database_proxy,
+    m2m_changed,
+)
+
+# bm25 weights, in JobIndex column order: title, skills, requirements, description
+WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+MAX_TERMS = 8
+# relevance is ranked among this many newest matches, scoring every match of a
+# common term costs ~0.5s on 500k jobs
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", 2000))
+REINDEX_BATCH_SIZE = 1000
+
+_translation = str.maketrans(
+    {
+        "ي": "ی",
+        "ى": "ی",
+        "ك": "ک",
+        "ة": "ه",
+        "ۀ": "ه",
+        "أ": "ا",
+        "إ": "ا",
+        "ٱ": "ا",
+        "ؤ": "و",
+        "\u200c": " ",  # ZWNJ, "نرم‌افزار" is found by "نرم افزار"
+        "\u200d": None,
+        "\ufeff": None,
+        "\u0640": None,  # tatweel
+        **{chr(c): None for c in range(0x064B, 0x0660)},  # harakat
+        "\u0670": None,
+        **{chr(0x06F0 + d): str(d) for d in range(10)},  # Persian digits
+        **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic digits
+    }
+)
+
+
+def normalize(text: str) -> str:
+    """folds Arabic letter forms, digits, ZWNJ and diacritics for indexing"""
+    return text.translate(_translation).lower()
+
+
+def terms(text: str) -> list[str]:
+    return re.findall(r"\w+", normalize(text))
+
+
+def match_expression(query: str) -> str | None:
+    """FTS5 query matching all terms, the last one as a prefix (type-ahead)"""
+    words = terms(query)[:MAX_TERMS]
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+
+
+def enabled() -> bool:
+    # the place to plug another engine (e.g. PostgreSQL tsvector) in
+    return isinstance(database_proxy.obj, SqliteDatabase)
+
+
+def _document(job: Job, skills: list[str]) -> dict:
+    requirements = job.requirements
+    if isinstance(requirements, dict):
+        requirements = requirements.values()
+    return dict(
+        rowid=job.id,
+        title=normalize(job.title or ""),
+        skills=normalize(" ".join(skills)),
+        requirements=normalize(" ".join(map(str, requirements or ()))),
+        description=normalize(job.description or ""),
+    )
+
+
+def index_job(job: Job) -> None:
+    if job.expired or job.expire_on <= datetime.now():
+        unindex_jobs([job.id])
+        return
+    skills = [skill.title for skill in job.skills.select(Skill.title)]
+    JobIndex.replace(**_document(job, skills)).execute()
+
+
+def unindex_jobs(ids: list[int]) -> None:
+    if enabled():
+        JobIndex.delete().where(JobIndex.rowid.in_(ids)).execute()
+
+
+def rebuild_index(batch_size: int = REINDEX_BATCH_SIZE) -> int:
+    """re-indexes every active job, returns how many"""
+    JobSkill = Job.skills.get_through_model()
+    JobIndex.delete().execute()
+    total = last_id = 0
+    while True:
+        with database_proxy.atomic():
+            jobs = list(
+                Job.select()
+                .where(Job.id > last_id, Job.active())
+                .order_by(Job.id)
+                .limit(batch_size)
+            )
+            if not jobs:
+                break
+            skills = {job.id: [] for job in jobs}
+            for job_id, title in (
+                JobSkill.select(JobSkill.job, Skill.title)
+                .join(Skill)
+                .where(JobSkill.job.in_(list(skills)))
+                .tuples()
+            ):
+                skills[job_id].append(title)
+            JobIndex.insert_many(
+                [_document(job, skills[job.id]) for job in jobs]
+            ).execute()
+        total += len(jobs)
+        last_id = jobs[-1].id
+    # merges the index segments, a fragmented index answers ~2x slower
+    JobIndex.optimize()
+    return total
+
+
+# only active jobs are indexed, the expiry sweep drops expired ones
+@post_save(sender=Job)
+@m2m_changed(sender=Job)
+def _index_job(sender, instance, *args, **kwargs):
+    if enabled():
+        index_job(instance)
+
+
+# jobs a skill was removed from through `skill.jobs` keep it until their next
+# save or `python -m app.manage reindex`
+@m2m_changed(sender=Skill)
+def _index_skill_jobs(sender, instance, *args, **kwargs):
+    if enabled():
+        JobSkill = Job.skills.get_through_model()
+        for job in Job.select().where(
+            Job.id.in_(JobSkill.select(JobSkill.job).where(JobSkill.skill == instance))
+        ):
+            index_job(job)
+
+
+@post_delete(sender=Job)
+def _unindex_job(sender, instance, *args, **kwargs):
+    unindex_jobs([instance.id])
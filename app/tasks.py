@@ -0,0 +1,95 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from logging import getLogger
+from time import perf_counter
+from typing import Callable
+import os
+
+from app import listing, search
+from app.database import async_db
+from app.models.dbmodel import Job, JobRequest
+
+EXPIRY_INTERVAL = int(os.environ.get("EXPIRY_INTERVAL", 2 * 3600))  # seconds
+EXPIRY_BATCH_SIZE = int(os.environ.get("EXPIRY_BATCH_SIZE", 5000))
+EXPIRY_LOCK = "pisheh:expiry-sweep"
+
+logger = getLogger("API")
+
+
+@dataclass
+class ExpirySweep:
+    started_on: datetime
+    jobs: int
+    job_requests: int
+    seconds: float
+
+
+# most recent runs of this worker, newest last
+sweeps: deque[ExpirySweep] = deque(maxlen=20)
+
+
+def expire_rows(
+    model,
+    now: datetime,
+    batch_size: int = EXPIRY_BATCH_SIZE,
+    on_expire: Callable[[list[int]], None] = None,
+) -> int:
+    """
+    flags rows of `model` whose `expire_on` passed, one short transaction per
+    `batch_size` rows so writers are never blocked for the whole sweep.
+    `on_expire` gets the ids of each batch inside its transaction.
+    """
+    total = 0
+    while True:
+        with model._meta.database.atomic():
+            ids = [
+                row.id
+                for row in model.select(model.id)
+                .where(model.expired == False, model.expire_on <= now)
+                .limit(batch_size)
+            ]
+            if ids:
+                model.update(expired=True).where(model.id.in_(ids)).execute()
+                if on_expire is not None:
+                    on_expire(ids)
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+def _unlist_expired(ids: list[int]) -> None:
+    search.unindex_jobs(ids)
+    listing.unlist_jobs(ids)
+
+
+def expire_jobs(now: datetime = None) -> int:
+    return expire_rows(Job, now or datetime.now(), on_expire=_unlist_expired)
+
+
+def expire_job_requests(now: datetime = None) -> int:
+    return expire_rows(JobRequest, now or datetime.now())
+
+
+def sweep_expired() -> ExpirySweep:
+    now = datetime.now()
+    start = perf_counter()
+    jobs = expire_jobs(now)
+    job_requests = expire_job_requests(now)
+    sweep = ExpirySweep(now, jobs, job_requests, perf_counter() - start)
+    sweeps.append(sweep)
+    logger.info(
+        f"expiry sweep: {jobs} jobs, {job_requests} job requests "
+        f"in {sweep.seconds:.3f}s"
+    )
+    return sweep
+
+
+async def run_expiry_sweep(redis) -> ExpirySweep | None:
+    """sweeps unless another worker already did within this interval"""
+    acquired = await redis.set(
+        EXPIRY_LOCK, os.getpid(), nx=True, ex=int(EXPIRY_INTERVAL * 0.9)
+    )
+    if not acquired:
+        return None
+    return await async_db.run(sweep_expired)
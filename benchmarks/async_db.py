@@ -0,0 +1,103 @@
+"""
+GET /literals/cities latency under 200 concurrent clients, alone and while
+heavy job searches run, either on the database pool (as the routers do) or
+inline on the event loop (as they did before `AsyncDatabase`):
+
+    python -m benchmarks.async_db [clients] [searchers] [jobs] [db path]
+
+reuses the catalogue `benchmarks.search` builds at the same path.
+"""
+from itertools import count
+from random import Random, random
+from statistics import quantiles
+from time import perf_counter
+import asyncio
+import os
+import sys
+
+import httpx
+
+from app.database import create_database
+from app.main import app
+from app.models.dbmodel import *
+from app.routers.jobs import search_page
+from app.search import rebuild_index
+from benchmarks.search import QUERIES, populate
+
+REQUESTS_PER_CLIENT = 10
+# between a client's requests; without it the clients alone saturate the loop
+THINK_SECONDS = 1.0
+nonce = count()
+
+
+async def cheap_client(client: httpx.AsyncClient, timings: list[float]):
+    # spread over the interval, not all at once
+    await asyncio.sleep(random() * THINK_SECONDS)
+    for _ in range(REQUESTS_PER_CLIENT):
+        start = perf_counter()
+        response = await client.get("/literals/cities")
+        timings.append((perf_counter() - start) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(THINK_SECONDS)
+
+
+async def pooled_searcher(client: httpx.AsyncClient, stop: asyncio.Event):
+    while not stop.is_set():
+        # a fresh query string each time, the response cache would answer
+        # repeated ones
+        query = QUERIES[next(nonce) % len(QUERIES)]
+        await client.get("/jobs/search", params={"q": query, "n": next(nonce)})
+
+
+async def inline_searcher(client: httpx.AsyncClient, stop: asyncio.Event):
+    while not stop.is_set():
+        search_page(QUERIES[next(nonce) % len(QUERIES)], 1, 10)
+        await asyncio.sleep(0)
+
+
+async def scenario(clients: int, searchers: int, searcher) -> list[float]:
+    timings: list[float] = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        background = [
+            asyncio.create_task(searcher(client, stop)) for _ in range(searchers)
+        ]
+        await asyncio.sleep(0.2)
+        await asyncio.gather(*(cheap_client(client, timings) for _ in range(clients)))
+        stop.set()
+        await asyncio.gather(*background)
+    return timings
+
+
+def main(
+    clients: int = 200,
+    searchers: int = 8,
+    jobs: int = 500_000,
+    path: str = "/tmp/search-bench.sqlite",
+):
+    fresh = not os.path.exists(path)
+    db = create_database(f"sqlite:///{path}")
+    database_proxy.initialize(db)
+    if fresh:
+        db.create_tables(TABLES)
+        populate(db, jobs, Random(1))
+        rebuild_index()
+    start = perf_counter()
+    search_page(QUERIES[1], 1, 10)
+    print(f"one search: {(perf_counter() - start) * 1000:.1f}ms")
+
+    for name, searcher, busy in (
+        ("idle", None, 0),
+        ("searches on the pool", pooled_searcher, searchers),
+        ("searches on the loop", inline_searcher, searchers),
+    ):
+        timings = asyncio.run(scenario(clients, busy, searcher))
+        p50, p99 = (quantiles(timings, n=100)[i] for i in (49, 98))
+        print(
+            f"{name:22s} {len(timings)} requests  "
+            f"p50 {p50:7.1f}ms  p99 {p99:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(a) if a.isdigit() else a for a in sys.argv[1:]))
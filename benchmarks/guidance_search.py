@@ -0,0 +1,85 @@
+"""
+queries and time per guidance search page, paginating categories and loading
+their guides one by one (as `get_guides` did) vs `guide_page`:
+
+    python -m benchmarks.guidance_search [categories] [mean guides per category]
+"""
+from math import ceil
+from time import perf_counter
+import sys
+
+from app.database import CountingSqliteDatabase, QueryCounter
+from app.models.dbmodel import *
+from app.models.schemas import GuideItem, GuidesPage, PaginationMeta
+from app.routers.guidance import guide_page
+
+PER_PAGE = 10
+
+
+def category_page(where, page: int, per_page: int) -> GuidesPage:
+    count = JobCategory.select().where(where).count()
+    guides = []
+    for jc in JobCategory.select().where(where).paginate(page, per_page):
+        guides.extend([guide.to_schema(GuideItem) for guide in jc.guides])
+    return GuidesPage(
+        meta=PaginationMeta(
+            total_count=count,
+            current_page=page,
+            page_count=ceil(count / per_page),
+            per_page=per_page,
+        ),
+        guides=guides,
+    )
+
+
+def populate(categories: int, guides: int):
+    with database_proxy.atomic():
+        for i in range(categories):
+            category = JobCategory.create(
+                slug=f"c{i}",
+                title=f"category {i}",
+                course="web",
+                expertise="-",
+                type=JobType.office,
+            )
+            # 0 to 2 * guides, so category pages vary in size
+            for j in range(i % (2 * guides + 1)):
+                Guide.create(
+                    slug=f"g{i}-{j}",
+                    title=f"guide {j}",
+                    summary="-",
+                    basic="-" * 2000,
+                    category=category,
+                )
+
+
+def measure(func, pages: int):
+    sizes = []
+    with QueryCounter() as queries:
+        start = perf_counter()
+        for page in range(1, pages + 1):
+            sizes.append(len(func(page).guides))
+        elapsed = perf_counter() - start
+    return queries.count / pages, elapsed / pages * 1000, min(sizes), max(sizes)
+
+
+def main(categories: int = 500, guides: int = 4):
+    db = CountingSqliteDatabase(":memory:")
+    database_proxy.initialize(db)
+    db.create_tables(TABLES)
+    populate(categories, guides)
+
+    where = JobCategory.course == "web"
+    for name, func in (
+        ("categories", lambda page: category_page(where, page, PER_PAGE)),
+        ("guides", lambda page: guide_page(JobCategory, where, page, PER_PAGE)),
+    ):
+        queries, ms, smallest, largest = measure(func, 20)
+        print(
+            f"{name:12s} {queries:5.1f} queries/page {ms:7.2f} ms/page "
+            f"{smallest}-{largest} guides/page"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
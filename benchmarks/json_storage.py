@@ -0,0 +1,116 @@
+"""
+write/read throughput and file size of JSON columns, stored as `json.dumps`
+text (as `JsonField` did before migration 10) vs the packed encoding:
+
+    python -m benchmarks.json_storage [rows]
+"""
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+import sys
+
+from peewee import CharField, Model, SqliteDatabase
+
+from app.models.dbmodel import (
+    ExamProcessDataSchema,
+    ExamQuestionSchema,
+    JsonField,
+    JsonObjectField,
+)
+from tests.data import JOBS
+
+
+class TextJsonField(CharField):
+    def db_value(self, value):
+        if value:
+            return json.dumps(value)
+        return value
+
+    def python_value(self, value):
+        if value:
+            return json.loads(value)
+        return value
+
+
+class TextJsonObjectField(CharField):
+    def db_value(self, value):
+        return value.json()
+
+    def python_value(self, value):
+        return ExamProcessDataSchema(**json.loads(value))
+
+
+def models(database, text: bool):
+    class Row(Model):
+        title = CharField()
+        requirements = TextJsonField() if text else JsonField()
+        process = (
+            TextJsonObjectField() if text else JsonObjectField(ExamProcessDataSchema)
+        )
+
+        class Meta:
+            table_name = "row"
+
+    Row._meta.set_database(database)
+    return Row
+
+
+def values(i: int) -> dict:
+    job = JOBS[i % len(JOBS)]
+    return dict(
+        title=job["title"],
+        requirements=job["requirements"],
+        process=ExamProcessDataSchema(
+            questions=[
+                ExamQuestionSchema(question_id=q, answers=list(range(4)))
+                for q in range(i % 40)
+            ],
+            user_answers=list(range(i % 40)),
+        ),
+    )
+
+
+def run(path: str, text: bool, rows: int) -> tuple[float, ...]:
+    database = SqliteDatabase(path)
+    Row = models(database, text)
+    database.create_tables([Row])
+    data = [values(i) for i in range(rows)]
+
+    start = perf_counter()
+    with database.atomic():
+        for batch in range(0, rows, 500):
+            Row.insert_many(data[batch : batch + 500]).execute()
+    write = perf_counter() - start
+
+    start = perf_counter()
+    titles = [row.title for row in Row.select()]
+    listed = perf_counter() - start
+
+    start = perf_counter()
+    read = [(row.requirements, row.process) for row in Row.select()]
+    decoded = perf_counter() - start
+
+    assert len(titles) == len(read) == rows
+    assert read[7] == (data[7]["requirements"], data[7]["process"])
+    database.close()
+    return rows / write, rows / listed, rows / decoded, os.path.getsize(path)
+
+
+def main(rows: int = 5000):
+    with TemporaryDirectory() as tmp:
+        results = {
+            name: run(os.path.join(tmp, f"{name}.sqlite"), name == "text", rows)
+            for name in ("text", "packed")
+        }
+    print(f"{rows} rows")
+    print(f"{'':8s} {'write/s':>10s} {'list/s':>10s} {'decode/s':>10s} {'size':>10s}")
+    for name, (write, listed, decoded, size) in results.items():
+        print(
+            f"{name:8s} {write:10.0f} {listed:10.0f} {decoded:10.0f} "
+            f"{size / 2**20:8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+GET /me/recommended-jobs scoring over a synthetic index of active jobs
+(skills and categories only, the database holds just the seekers):
+
+    python -m benchmarks.recommend [jobs] [seeker skills]
+"""
+from collections import defaultdict
+from random import Random
+from statistics import quantiles
+from time import perf_counter, monotonic
+import sys
+
+from app.database import CountingSqliteDatabase
+from app.facets import bitmap, facet_index
+from app.models.dbmodel import *
+from app.recommend import recommend
+from datetime import datetime, timedelta
+
+SKILLS = 400
+CATEGORIES = 60
+
+
+def fill_index(jobs: int, rng: Random):
+    """sets the facet index directly, a rebuild of this size takes a while"""
+    skills = [f"s{i}" for i in range(SKILLS)]
+    # a few skills are in most jobs, most are rare
+    popularity = [1 / (i + 1) for i in range(SKILLS)]
+    expire_on = datetime.now() + timedelta(days=30)
+    ids = {"skill": defaultdict(list), "category": defaultdict(list)}
+    entries = {}
+    for job_id in range(1, jobs + 1):
+        values = dict(
+            skill=tuple(set(rng.choices(skills, popularity, k=rng.randint(2, 8)))),
+            category=(f"c{rng.randrange(CATEGORIES)}",),
+        )
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                ids[facet][value].append(job_id)
+        entries[job_id] = (values, expire_on)
+    facet_index.bitmaps = {
+        facet: {value: bitmap(v) for value, v in values.items()}
+        for facet, values in ids.items()
+    }
+    facet_index.jobs = entries
+    facet_index.active = bitmap(entries)
+    facet_index.built_on = monotonic()
+
+
+def seeker(skills: int, rng: Random) -> int:
+    seeker = Seeker.create(firstname="-", lastname="-")
+    for i in rng.sample(range(SKILLS), skills):
+        skill, _ = Skill.get_or_create(slug=f"s{i}", defaults={"title": "-"})
+        SeekerSkill.create(seeker=seeker, skill=skill, score=rng.randint(0, 100))
+    personality, _ = Personality.get_or_create(
+        slug="INTJ", defaults={"test": "-", "model": "-"}
+    )
+    if not personality.job_categories.count():
+        for i in range(5):
+            category = JobCategory.create(
+                slug=f"c{i}", title="-", course="-", expertise="-", type=JobType.office
+            )
+            personality.job_categories.add(category)
+    seeker.personalities.add(personality)
+    return seeker.id
+
+
+def main(jobs: int = 500_000, skills: int = 12):
+    rng = Random(1)
+    db = CountingSqliteDatabase(":memory:")
+    database_proxy.initialize(db)
+    db.create_tables(TABLES)
+    start = perf_counter()
+    fill_index(jobs, rng)
+    print(f"{jobs} jobs indexed in {perf_counter() - start:.1f}s")
+
+    seekers = [seeker(skills, rng) for _ in range(20)]
+    times = []
+    for seeker_id in seekers * 5:
+        start = perf_counter()
+        top = recommend(seeker_id)
+        times.append((perf_counter() - start) * 1000)
+    assert len(top) == 50
+    p50, p95 = (quantiles(times, n=20)[i] for i in (9, 18))
+    print(f"top 50 of {skills} skills: p50 {p50:.1f}ms p95 {p95:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
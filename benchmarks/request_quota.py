@@ -0,0 +1,104 @@
+"""
+concurrent job requests from several worker processes against one database,
+checking the quota and dedupe invariants hold:
+
+    python -m benchmarks.request_quota [workers] [seekers] [db path]
+"""
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from time import perf_counter
+import os
+import sys
+
+from fastapi import HTTPException
+
+from app.database import create_database
+from app.models.dbmodel import *
+from app.quota import REQUEST_QUOTA
+from app.routers.jobrequest import create_request
+from tests.conftest import add_jobs
+
+JOBS = 20
+ATTEMPTS = 40  # per seeker, duplicates included
+
+
+def populate(seekers: int):
+    add_jobs(JOBS)
+    for i in range(seekers):
+        seeker = Seeker.create(firstname="name", lastname=f"{i}")
+        User.create(
+            email=f"s{i}@example.com",
+            phone_number=f"0913{i:07d}",
+            pass_hash="-",
+            role=Role.seeker,
+            seeker=seeker,
+        )
+
+
+def worker(path: str, attempts: list[tuple[int, int]]) -> dict[int, int]:
+    database_proxy.initialize(create_database(f"sqlite:///{path}"))
+    users = {user.seeker_id: user for user in User.select().where(User.seeker)}
+    statuses: dict[int, int] = {}
+    for seeker_id, job_id in attempts:
+        try:
+            create_request(job_id, users[seeker_id])
+            status = 200
+        except HTTPException as e:
+            status = e.status_code
+        statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def main(workers: int = 8, seekers: int = 50, path: str = "/tmp/quota-bench.sqlite"):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db = create_database(f"sqlite:///{path}")
+    database_proxy.initialize(db)
+    db.create_tables(TABLES)
+    populate(seekers)
+    seeker_ids = [user.seeker_id for user in User.select().where(User.seeker)]
+    db.close()
+
+    rng = Random(1)
+    attempts = [
+        (seeker_id, rng.randint(1, JOBS))
+        for seeker_id in seeker_ids
+        for _ in range(ATTEMPTS)
+    ]
+    rng.shuffle(attempts)
+    start = perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(
+            worker, [path] * workers, [attempts[i::workers] for i in range(workers)]
+        )
+        statuses: dict[int, int] = {}
+        for result in results:
+            for status, count in result.items():
+                statuses[status] = statuses.get(status, 0) + count
+    seconds = perf_counter() - start
+
+    db.connect(reuse_if_open=True)
+    requests = JobRequest.select().count()
+    unique = JobRequest.select(JobRequest.job, JobRequest.seeker).distinct().count()
+    counted = Job.select(fn.SUM(Job.requests_count)).scalar()
+    over_quota = (
+        JobRequest.select(JobRequest.seeker)
+        .group_by(JobRequest.seeker)
+        .having(fn.COUNT(JobRequest.id) > REQUEST_QUOTA)
+        .count()
+    )
+    print(
+        f"{len(attempts)} attempts from {workers} processes in {seconds:.2f}s "
+        f"({len(attempts) / seconds:.0f}/s): {dict(sorted(statuses.items()))}"
+    )
+    print(
+        f"{requests} requests, {unique} unique, requests_count sum {counted}, "
+        f"{over_quota} seekers over quota"
+    )
+    assert requests == unique == counted == statuses.get(200, 0)
+    assert over_quota == 0
+
+
+if __name__ == "__main__":
+    main(*(int(a) if a.isdigit() else a for a in sys.argv[1:]))
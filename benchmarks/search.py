@@ -0,0 +1,93 @@
+"""
+GET /jobs/search latency over a synthetic catalogue:
+
+    python -m benchmarks.search [jobs] [db path]
+"""
+from random import Random
+from statistics import quantiles
+from time import perf_counter
+import os
+import sys
+
+from fastapi import HTTPException
+
+from app.database import create_database
+from app.models.dbmodel import *
+from app.models.schemas import JobType
+from app.routers.jobs import search_page
+from app.search import rebuild_index
+from datetime import datetime, timedelta
+
+WORDS = (
+    "برنامه نویس پایتون جاوا وب طراح گرافیک حسابدار مالی فروش بازاریابی "
+    "پشتیبانی شبکه امنیت داده تحلیل مدیر پروژه محصول کارشناس ارشد کارآموز "
+    "دورکاری تهران مشهد اصفهان مهندس عمران برق مکانیک معماری مترجم انگلیسی "
+    "تولید محتوا سئو اندروید آی او اس ری اکت جنگو لاراول دواپس لینوکس"
+).split()
+QUERIES = ["پایتون", "برنامه نویس", "طراح گرافیک", "مدیر پروژه ارشد", "اندر", "سئو"]
+
+
+def populate(db, count: int, rng: Random):
+    category = JobCategory.create(
+        slug="bench", title="-", course="-", expertise="-", type=JobType.office
+    )
+    employer = Employer.create(co_name="-", city="تهران")
+    User.create(
+        email="bench@example.com",
+        phone_number="09120000000",
+        pass_hash="-",
+        role=Role.employer,
+        employer=employer,
+    )
+    now = datetime.now()
+    with db.atomic():
+        for start in range(0, count, 5000):
+            Job.insert_many(
+                [
+                    dict(
+                        title=" ".join(rng.choices(WORDS, k=3)),
+                        description=" ".join(rng.choices(WORDS, k=40)),
+                        requirements=rng.choices(WORDS, k=4),
+                        category=category,
+                        min_salary=0,
+                        max_salary=0,
+                        created_on=now - timedelta(minutes=i),
+                        expire_on=now + timedelta(days=rng.randint(-10, 30)),
+                        employer=employer,
+                        day_time="-",
+                        type="تمام وقت",
+                    )
+                    for i in range(start, min(start + 5000, count))
+                ]
+            ).execute()
+
+
+def main(count: int = 500_000, path: str = "/tmp/search-bench.sqlite"):
+    fresh = not os.path.exists(path)
+    db = create_database(f"sqlite:///{path}")
+    database_proxy.initialize(db)
+    if fresh:
+        db.create_tables(TABLES)
+        start = perf_counter()
+        populate(db, count, Random(1))
+        print(f"{count} jobs inserted in {perf_counter() - start:.1f}s")
+        start = perf_counter()
+        rebuild_index()
+        print(f"indexed in {perf_counter() - start:.1f}s")
+
+    for query in QUERIES:
+        timings = []
+        for _ in range(20):
+            start = perf_counter()
+            try:
+                page = search_page(query, 1, 10)
+            except HTTPException:
+                page = None
+            timings.append((perf_counter() - start) * 1000)
+        p50, p95 = quantiles(timings, n=20)[9], quantiles(timings, n=20)[18]
+        total = page.meta.total_count if page else 0
+        print(f"{query:20s} {total:7d} hits  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) if a.isdigit() else a for a in sys.argv[1:]))
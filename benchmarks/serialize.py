@@ -0,0 +1,115 @@
+"""
+per-object cost of turning rows into response schemas, reflective
+`to_schema` (as it was before compiled plans) vs `serialize`:
+
+    python -m benchmarks.serialize [rows]
+"""
+from time import perf_counter
+import sys
+
+import peewee
+import pydantic
+
+from app.database import CountingSqliteDatabase
+from app.models.dbmodel import *
+from app.models.prefetch import prefetch_schema
+from app.models.schemas import GuideSchema, JobRequestSchema, JobSchema, JobType
+from app.models.serializers import serialize
+from tests.conftest import add_jobs
+
+
+def reflective_to_schema(self, type_):
+    data = {}
+    for name, field in type_.__fields__.items():
+        value = getattr(self, name)
+        if isinstance(value, peewee.Model):
+            value = reflective_to_schema(value, field.type_)
+        if isinstance(value, peewee.ModelSelect) or (
+            isinstance(value, list)
+            and isinstance(field.type_, type)
+            and issubclass(field.type_, pydantic.BaseModel)
+        ):
+            l = [reflective_to_schema(v, field.sub_fields[0].type_) for v in value]
+            if l:
+                value = l
+            else:
+                continue
+        data[name] = value
+    return type_(**data)
+
+
+def populate(rows: int):
+    add_jobs(rows)
+    guide = Guide.get()
+    for i, skill in enumerate(Skill.select()):
+        Course.create(
+            slug=f"c{i}", title=f"course {i}", description="-", link="-", skill=skill
+        )
+        SkillTimeline.create(
+            title=f"step {i}", description="-", guide=guide, skill=skill, index=i
+        )
+    seeker = Seeker.create(firstname="name", lastname="family")
+    User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seeker,
+    )
+    for job in Job.select():
+        JobRequest.create(job=job, seeker=seeker)
+    for i in range(rows):
+        category = JobCategory.create(
+            slug=f"cat{i}",
+            title=f"category {i}",
+            course="-",
+            expertise="-",
+            type=JobType.office,
+        )
+        Guide.create(
+            slug=f"g{i}", title=f"guide {i}", summary="-", basic="-", category=category
+        )
+        for step in guide.timeline:
+            SkillTimeline.create(
+                title=step.title,
+                description="-",
+                guide=f"g{i}",
+                skill=step.skill,
+                index=step.index,
+            )
+
+
+def measure(func, objs, schema, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for obj in objs:
+            func(obj, schema)
+        best = min(best, perf_counter() - start)
+    return best / len(objs) * 1e6
+
+
+def main(rows: int = 200):
+    db = CountingSqliteDatabase(":memory:")
+    database_proxy.initialize(db)
+    db.create_tables(TABLES)
+    populate(rows)
+
+    for model, schema in (
+        (Job, JobSchema),
+        (Guide, GuideSchema),
+        (JobRequest, JobRequestSchema),
+    ):
+        objs = prefetch_schema(model.select(), schema)
+        for obj in objs[:5]:
+            assert reflective_to_schema(obj, schema) == serialize(obj, schema)
+        before = measure(reflective_to_schema, objs, schema)
+        after = measure(serialize, objs, schema)
+        print(
+            f"{schema.__name__:18s} {before:8.1f} us -> {after:8.1f} us "
+            f"({before / after:.1f}x, {len(objs)} rows)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
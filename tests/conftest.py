@@ -0,0 +1,50 @@
+import pytest
+from app.models.dbmodel import *
+from app.catalogue import seeker_personalities
+from app.ranking import rankings
+from app.database import CountingSqliteDatabase
+from app.models.schemas import JobType
+from datetime import datetime, timedelta
+
+
+@pytest.fixture()
+def memory_db():
+    db_ = CountingSqliteDatabase(":memory:")
+    database_proxy.initialize(db_)
+    db_.connect()
+    db_.create_tables(TABLES)
+    # keyed by row ids, which every fresh database reuses
+    seeker_personalities.clear()
+    rankings.clear()
+    yield db_
+    db_.close()
+
+
+def add_jobs(count):
+    category = JobCategory.create(
+        slug="web", title="وب", course="کامپیوتر", expertise="نرم‌افزار", type=JobType.office
+    )
+    Guide.create(slug="web-guide", title="راهنما", summary="خلاصه", basic="-", category=category)
+    skills = [Skill.create(slug=f"s{i}", title=f"skill {i}") for i in range(3)]
+    for i in range(count):
+        employer = Employer.create(co_name=f"co {i}", city="تهران")
+        User.create(
+            email=f"e{i}@example.com",
+            phone_number=f"091200000{i:02d}",
+            pass_hash="-",
+            role=Role.employer,
+            employer=employer,
+        )
+        job = Job.create(
+            title=f"job {i}",
+            description="-",
+            requirements=["a", "b"],
+            min_salary=0,
+            max_salary=0,
+            expire_on=datetime.now() + timedelta(days=1),
+            employer=employer,
+            category=category,
+            day_time="-",
+            type="تمام وقت",
+        )
+        job.skills.add(skills[: 1 + i % 3])
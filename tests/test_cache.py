@@ -0,0 +1,30 @@
+from app.cache import TTLCache
+from time import sleep
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_tag_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=["user:1"])
+    cache.set("b", 2, tags=["user:1", "seeker:4"])
+    cache.set("c", 3, tags=["user:2"])
+    assert cache.invalidate("seeker:4") == 1
+    assert cache.invalidate("user:1") == 1
+    assert len(cache) == 1 and cache.get("c") == 3
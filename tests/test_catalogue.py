@@ -0,0 +1,71 @@
+from app.catalogue import Catalogue, catalogue, current_version, suited_categories
+from app.database import QueryCounter
+from app.models.dbmodel import *
+from app.routers import category, me
+
+
+def test_catalogue_snapshot(memory_db):
+    JobCategory.create(
+        slug="dev", title="Developer", course="-", expertise="-", type=JobType.office
+    )
+    Personality.create(slug="INTJ", test="-", model="-")
+
+    snapshot = catalogue.snapshot
+    assert set(snapshot.categories) == {"dev"} and "INTJ" in snapshot.personalities
+    with QueryCounter() as queries:
+        response = category.category_detail("dev")
+        assert catalogue.snapshot is snapshot
+    assert queries.count == 0
+    assert b'"title":"Developer"' in response.body
+
+    # a write bumps the shared version and marks this worker's copy stale
+    version = current_version()
+    JobCategory.create(
+        slug="qa", title="Tester", course="-", expertise="-", type=JobType.office
+    )
+    assert current_version() == version + 1
+    assert "qa" in catalogue.snapshot.category_bodies
+
+    # another worker's write is noticed by `check`
+    other = Catalogue()
+    other.snapshot
+    CatalogueVersion.update(version=CatalogueVersion.version + 1).execute()
+    other.check()
+    assert other.snapshot.version == current_version()
+
+
+def test_personality_index(memory_db):
+    web, data = (
+        JobCategory.create(
+            slug=slug, title="-", course="-", expertise="-", type=JobType.office
+        )
+        for slug in ("web", "data")
+    )
+    personality = Personality.create(slug="INTJ", test="-", model="-")
+    seeker = Seeker.create(firstname="-", lastname="-")
+    personality.job_categories.add([web, data])
+    assert suited_categories("INTJ", seeker.id) is None
+
+    seeker.personalities.add(personality)
+    assert suited_categories("INTJ", seeker.id) == ("data", "web")
+    web.personalities.remove(personality)
+    assert suited_categories("INTJ", seeker.id) == ("data",)
+    # warm, the filter costs nothing
+    with QueryCounter() as queries:
+        assert suited_categories("INTJ", seeker.id) == ("data",)
+    assert queries.count == 0
+
+
+def test_my_personalities(memory_db):
+    personality = Personality.create(slug="INTJ", test="-", model="-")
+    Personality.create(slug="ENFP", test="-", model="-")
+    seekers = [Seeker.create(firstname="-", lastname="-") for _ in range(2)]
+    user = User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seekers[0],
+    )
+    seekers[0].personalities.add(personality)
+    assert [p.slug for p in me.seeker_personalities(user)] == ["INTJ"]
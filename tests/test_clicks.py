@@ -0,0 +1,40 @@
+import asyncio
+from app.clicks import ClickCounter, course_links
+from app.database import QueryCounter
+from app.models.dbmodel import *
+from app.routers import courses
+
+
+class RunHere:
+    """stands in for `AsyncDB`, runs on the test's own connection"""
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+def test_click_counting(memory_db, monkeypatch):
+    skill = Skill.create(slug="s", title="-")
+    for slug in ("a", "b", "c"):
+        Course.create(
+            slug=slug, title="-", description="-", link=f"/{slug}", skill=skill
+        )
+    course_links.clear()
+    counter = ClickCounter()
+    monkeypatch.setattr(courses, "click_counter", counter)
+
+    with QueryCounter() as queries:
+        for slug in ("a", "a", "b", "a", "c"):
+            response = asyncio.run(courses.get_course(slug, RunHere()))
+    assert response.headers["location"] == "/c"
+    # links were read once each, no writes yet
+    assert queries.count == 3 and counter.pending() == 5
+
+    with QueryCounter(record=True) as queries:
+        assert counter.flush() == 5
+    # b and c share an UPDATE
+    assert sum(sql.startswith("UPDATE") for sql, _ in queries.statements) == 2
+    assert {c.slug: c.clicks for c in Course.select()} == {"a": 3, "b": 1, "c": 1}
+
+    Course.update(link="/new").where(Course.slug == "a").execute()
+    Course.get_by_id("a").save()
+    assert course_links.get("a") is None
@@ -0,0 +1,103 @@
+from contextlib import aclosing
+import asyncio
+import orjson
+import pytest
+from fastapi import HTTPException
+from app import exports
+from app.database import AsyncDatabase
+from app.models.dbmodel import *
+from app.models.schemas import ExportFormat
+from app.routers.jobrequest import REQUEST_EXPORT_COLUMNS, request_rows
+from tests.conftest import add_jobs
+
+
+def test_export_requests_is_scoped(memory_db):
+    add_jobs(2)
+    seeker = Seeker.create(firstname="name", lastname="family")
+    seeker_user = User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seeker,
+    )
+    for job in Job.select():
+        JobRequest.create(job=job, seeker=seeker)
+    employer_user = User.get(User.employer == Job.get_by_id(1).employer)
+
+    lines = b"".join(request_rows(employer_user, ExportFormat.ndjson)).splitlines()
+    assert [orjson.loads(line)["job_id"] for line in lines] == [1]
+
+    body = b"".join(request_rows(seeker_user, ExportFormat.csv)).decode("utf-8-sig")
+    header, *rows = body.splitlines()
+    assert header == ",".join(REQUEST_EXPORT_COLUMNS) and len(rows) == 2
+    assert rows[0].split(",")[3] == "processing"
+
+
+def test_stream_stops_with_its_consumer():
+    db = AsyncDatabase(database_proxy, 1)
+    produced = []
+
+    def numbers():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    async def take(count):
+        items = []
+        async with aclosing(db.stream(numbers, maxsize=2)) as stream:
+            async for item in stream:
+                items.append(item)
+                if len(items) == count:
+                    break
+        return items
+
+    assert asyncio.run(take(3)) == [0, 1, 2]
+    db.shutdown()
+    # the worker stayed at most a queue ahead and stopped
+    assert len(produced) < 10
+
+
+def test_stream_waits_for_a_slow_consumer():
+    db = AsyncDatabase(database_proxy, 1)
+
+    async def take():
+        items = []
+        async for item in db.stream(lambda: iter(range(3)), maxsize=1):
+            # the worker waits on a full queue past its 1s poll
+            await asyncio.sleep(1.2 if not items else 0)
+            items.append(item)
+        return items
+
+    assert asyncio.run(take()) == [0, 1, 2]
+    db.shutdown()
+
+
+def test_export_slots_are_released():
+    db = AsyncDatabase(database_proxy, 1)
+
+    def rows():
+        yield b"row\n"
+
+    def export():
+        return exports.export_response(
+            db, rows, format=ExportFormat.ndjson, filename="rows"
+        )
+
+    async def read(response):
+        return [chunk async for chunk in response.body_iterator]
+
+    assert asyncio.run(read(export())) == [b"row\n"]
+    assert exports._running == 0
+    # dropped before streaming, e.g. the client went away
+    response = export()
+    assert exports._running == 1
+    del response
+    assert exports._running == 0
+    responses = [export() for _ in range(exports.EXPORT_CONCURRENCY)]
+    with pytest.raises(HTTPException) as e:
+        export()
+    assert e.value.status_code == 503
+    del responses
+    db.shutdown()
+    assert exports._running == 0
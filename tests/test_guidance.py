@@ -0,0 +1,125 @@
+import asyncio
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app.database import QueryCounter
+from app.models.dbmodel import *
+from app.guides import guide_bodies
+from app.routers.guidance import (
+    foreign_guides,
+    get_guide,
+    guide_body,
+    search2,
+    search_guides,
+)
+
+
+def test_guide_pages(memory_db):
+    for i, guides in enumerate((3, 0, 2)):
+        category = JobCategory.create(
+            slug=f"c{i}", title="-", course="web", expertise="-", type=JobType.office
+        )
+        for j in range(guides):
+            Guide.create(
+                slug=f"g{i}{j}", title="-", summary="-", basic="-", category=category
+            )
+    personality = Personality.create(slug="INTJ", test="-", model="-")
+    personality.job_categories.add(JobCategory.get_by_id("c2"))
+    seeker = Seeker.create(firstname="-", lastname="-")
+    user = User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seeker,
+    )
+
+    query = JobCategory.course == "web"
+    # pages hold guides, not categories
+    with QueryCounter() as queries:
+        pages = [search_guides(query, None, None, page, 2) for page in (1, 2, 3)]
+    assert queries.count == 3
+    assert [[g.slug for g in p.guides] for p in pages] == [
+        ["g00", "g01"],
+        ["g02", "g20"],
+        ["g21"],
+    ]
+    assert pages[0].meta.total_count == 5 and pages[0].meta.page_count == 3
+
+    with pytest.raises(HTTPException) as e:
+        search_guides(query, None, None, 4, 2)
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        foreign_guides(ForeignGuideMeta.course == "-", 1, 10)
+    assert e.value.status_code == 204
+
+    # only filters when the seeker has the personality
+    page = search_guides(query, user, "INTJ", 1, 10)
+    assert page.meta.total_count == 5
+    seeker.personalities.add(personality)
+    page = search_guides(query, user, "INTJ", 1, 10)
+    assert [g.slug for g in page.guides] == ["g20", "g21"]
+
+
+class RunHere:
+    """stands in for `AsyncDB`, runs on the test's own connection"""
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+def test_search_by_favourite_courses(memory_db):
+    for course in ("web", "data", "art"):
+        category = JobCategory.create(
+            slug=course, title="-", course=course, expertise="-", type=JobType.office
+        )
+        Guide.create(
+            slug=f"{course}-g", title="-", summary="-", basic="-", category=category
+        )
+    response = asyncio.run(search2(RunHere(), fav=["web", "data"]))
+    guides = [g["slug"] for g in orjson.loads(response.body)["guides"]]
+    assert guides == ["data-g", "web-g"]
+
+
+def roadmap(guide: Guide, steps: int):
+    for i in range(steps):
+        skill = Skill.create(slug=f"{guide.slug}-s{i}", title="-")
+        Course.create(
+            slug=f"{skill.slug}-c", title="-", description="-", link="-", skill=skill
+        )
+        Exam.create(title="-", exam_type=ExamTypes.skill, skill=skill)
+        SkillTimeline.create(
+            title="-", description="-", guide=guide, skill=skill, index=i
+        )
+
+
+def test_guide_detail(memory_db):
+    category = JobCategory.create(
+        slug="web", title="-", course="-", expertise="-", type=JobType.office
+    )
+    short, long = (
+        Guide.create(slug=slug, title="-", summary="-", basic="-", category=category)
+        for slug in ("short", "long")
+    )
+    roadmap(short, 2)
+    roadmap(long, 15)
+    guide_bodies.clear()
+
+    # the whole tree in the same few queries, however long the roadmap
+    counts = []
+    for slug in ("short", "long"):
+        with QueryCounter() as queries:
+            body = guide_body(slug)
+        counts.append(queries.count)
+    assert counts[0] == counts[1] <= 6
+    assert body.count(b'"link"') == 15
+
+    with QueryCounter() as queries:
+        response = asyncio.run(get_guide("long", RunHere()))
+    assert queries.count == 0 and response.body == body
+
+    Course.update(link="/new").where(Course.slug == "long-s3-c").execute()
+    Course.get_by_id("long-s3-c").save()
+    assert guide_bodies.get("long") is None and guide_bodies.get("short")
+    assert b"/new" in asyncio.run(get_guide("long", RunHere())).body
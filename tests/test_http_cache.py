@@ -0,0 +1,26 @@
+from app.http_cache import CachedResponse, make_etag, response_cache
+from app.models.dbmodel import *
+from app.models.schemas import JobType
+from tests.conftest import add_jobs
+import asyncio
+
+
+def test_tag_invalidation_on_write(memory_db):
+    entry = CachedResponse(b"{}", make_etag(b"{}"), "application/json")
+    assert CachedResponse.loads(entry.dumps()) == entry
+    asyncio.run(response_cache.set("/category/web?", entry, ("category", "guide")))
+    asyncio.run(response_cache.set("/jobs/?", entry, ("job", "category")))
+    asyncio.run(response_cache.set("/guidances/g?", entry, ("guide",)))
+    JobCategory.create(
+        slug="it", title="وب", course="-", expertise="-", type=JobType.office
+    )
+    assert asyncio.run(response_cache.get("/category/web?")) is None
+    assert asyncio.run(response_cache.get("/jobs/?")) is None
+    assert asyncio.run(response_cache.get("/guidances/g?")) == entry
+
+    add_jobs(1)
+    asyncio.run(response_cache.set("/jobs/?", entry, ("job", "category")))
+    # skills are written to the through table, not saved with the job
+    Job.get_by_id(1).skills.add(Skill.get_by_id("s1"))
+    assert asyncio.run(response_cache.get("/jobs/?")) is None
+    response_cache.local.clear()
@@ -0,0 +1,71 @@
+import orjson
+import pytest
+from fastapi import HTTPException
+from app.database import QueryCounter
+from app.listing import check_listing, rebuild_listing
+from app.models.dbmodel import *
+from app.models.prefetch import prefetch_schema
+from app.models.schemas import JobSchema
+from app.models.serializers import dumps
+from app.routers.category import categories_page, category_jobs_page
+from app.routers.jobs import jobs_page
+from tests.conftest import add_jobs
+
+
+def live_jobs():
+    return [
+        orjson.loads(dumps(job.to_schema(JobSchema)))
+        for job in prefetch_schema(Job.select().order_by(-Job.created_on), JobSchema)
+    ]
+
+
+def test_listing_matches_live_joins(memory_db):
+    add_jobs(4)
+    # skills are added after the jobs are saved
+    assert check_listing() == []
+    Job.get_by_id(1).skills.remove(Skill.get_by_id("s0"))
+    Skill.get_by_id("s2").jobs.add(Job.get_by_id(1))
+    assert check_listing() == []
+    assert rebuild_listing() == 4 and check_listing() == []
+
+    with QueryCounter() as counter:
+        page = jobs_page(1, 10, None, False)
+    assert counter.count == 2
+    assert orjson.loads(dumps(page))["jobs"] == live_jobs()
+    with pytest.raises(HTTPException) as e:
+        jobs_page(2, 10, None, False)
+    assert e.value.status_code == 400
+
+    # writes to joined rows re-render the jobs showing them
+    Employer.update(co_name="renamed").where(Employer.id == 1).execute()
+    assert check_listing() == [(1, "stale")]
+    Employer.get_by_id(1).save()
+    Guide.create(slug="g2", title="-", summary="-", basic="-", category="web")
+    assert check_listing() == []
+    assert orjson.loads(dumps(jobs_page(1, 10, None, False)))["jobs"] == live_jobs()
+
+    JobListing.delete().where(JobListing.job == 2).execute()
+    job = Job.get_by_id(1)
+    JobListing.create(
+        job=9, created_on=job.created_on, expire_on=job.expire_on, document="{}"
+    )
+    assert check_listing() == [(2, "missing"), (9, "orphan")]
+
+
+def test_category_page_errors(memory_db):
+    add_jobs(2)
+    JobCategory.create(
+        slug="empty", title="-", course="-", expertise="-", type=JobType.office
+    )
+    assert category_jobs_page("web", 1, 10, None, False).meta.total_count == 2
+    for args, code in (
+        (("nope", 1), 404),
+        (("web", 2), 400),
+        (("empty", 1), 204),
+    ):
+        with pytest.raises(HTTPException) as e:
+            category_jobs_page(*args, 10, None, False)
+        assert e.value.status_code == code
+    with pytest.raises(HTTPException) as e:
+        categories_page(None, None, None, None, None, 3, 1, None, None, False)
+    assert e.value.status_code == 400
@@ -0,0 +1,35 @@
+import json
+
+from app.models.dbmodel import *
+from app.migrations import MIGRATIONS, SchemaVersion, migrate
+from tests.conftest import add_jobs
+
+
+def test_migrate_existing_schema(memory_db):
+    memory_db.execute_sql("DROP INDEX jobcategory_course_expertise")
+    memory_db.execute_sql("ALTER TABLE job DROP COLUMN type")
+    assert migrate() == sorted(MIGRATIONS)
+    assert "type" in {c.name for c in memory_db.get_columns("job")}
+    assert "jobcategory_course_expertise" in {
+        i.name for i in memory_db.get_indexes("jobcategory")
+    }
+    assert SchemaVersion.select().count() == len(MIGRATIONS)
+    # already applied
+    assert migrate() == []
+
+
+def test_pack_json_columns(memory_db):
+    add_jobs(1)
+    # as the text field stored it
+    legacy = json.dumps(["مهارت", "تجربه"])
+    memory_db.execute_sql("UPDATE job SET requirements = ?", (legacy,))
+    assert migrate() == sorted(MIGRATIONS)
+    (raw,) = memory_db.execute_sql("SELECT requirements FROM job").fetchone()
+    assert isinstance(raw, bytes) and len(raw) < len(legacy)
+    job = Job.get()
+    # decoded on first access only
+    assert isinstance(job.__data__["requirements"], Encoded)
+    assert job.requirements == ["مهارت", "تجربه"]
+    job.requirements = ["x" * JSON_DEFLATE_MIN]
+    job.save()
+    assert Job.get().requirements == ["x" * JSON_DEFLATE_MIN]
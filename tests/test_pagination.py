@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+from app.models.dbmodel import *
+from app.pagination import keyset_paginate
+from tests.conftest import add_jobs
+from datetime import datetime
+
+
+def walk(query, keys, per_page, **kwargs):
+    pages, after = [], ""
+    while True:
+        rows, after = keyset_paginate(query, keys, after, per_page, **kwargs)
+        pages.append(rows)
+        if after is None:
+            return pages
+
+
+def test_cursor_pages_match_offset_order(memory_db):
+    add_jobs(11)
+    # ties on created_on must be broken by id
+    Job.update(created_on=datetime(2023, 5, 1)).where(Job.id % 2 == 0).execute()
+    keys = (Job.created_on, Job.id)
+    pages = walk(Job.select(), keys, 3)
+    assert [len(rows) for rows in pages] == [3, 3, 3, 2]
+    expected = Job.select().order_by(Job.created_on.desc(), Job.id.desc())
+    assert [job.id for rows in pages for job in rows] == [job.id for job in expected]
+
+
+def test_ascending_single_key(memory_db):
+    for slug in "dbca":
+        JobCategory.create(
+            slug=slug, title=slug, course="-", expertise="-", type=JobType.office
+        )
+    pages = walk(JobCategory.select(), (JobCategory.slug,), 3, descending=False)
+    assert [[c.slug for c in rows] for rows in pages] == [["a", "b", "c"], ["d"]]
+
+
+def test_bad_cursor(memory_db):
+    with pytest.raises(HTTPException):
+        keyset_paginate(Job.select(), (Job.created_on, Job.id), "not-a-cursor", 3)
@@ -0,0 +1,46 @@
+from passlib.hash import pbkdf2_sha256
+from time import sleep
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from app.passwords import PASSWORD_ROUNDS, PasswordHasher
+
+
+@pytest.fixture()
+def hasher():
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_verify_and_rehash(hasher):
+    old = pbkdf2_sha256.using(rounds=PASSWORD_ROUNDS // 2).hash("secret")
+
+    async def run():
+        return (
+            await hasher.verify_and_rehash(old, "wrong"),
+            await hasher.verify_and_rehash(old, "secret"),
+        )
+
+    wrong, (matched, new) = asyncio.run(run())
+    assert wrong == (False, None) and matched
+    assert pbkdf2_sha256.from_string(new).rounds == PASSWORD_ROUNDS
+    # the new hash is current, so it isn't replaced again
+    assert asyncio.run(hasher.verify_and_rehash(new, "secret")) == (True, None)
+    assert asyncio.run(hasher.verify(asyncio.run(hasher.hash("x")), "x"))
+
+
+def test_full_queue_answers_503(hasher):
+    async def run():
+        # one running, one queued: the third is refused without waiting
+        busy = [asyncio.create_task(hasher._run(sleep, 0.5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as e:
+            await hasher.hash("x")
+        await asyncio.gather(*busy)
+        return e.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and error.headers == {"Retry-After": "1"}
+    assert hasher.pending == 0
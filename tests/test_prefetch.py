@@ -0,0 +1,52 @@
+from app.models.dbmodel import *
+from app.database import QueryCounter
+from app.models.prefetch import prefetch_schema
+from app.models.schemas import JobSchema, GuideSchema
+from tests.conftest import add_jobs
+
+
+def render_jobs(limit):
+    with QueryCounter() as counter:
+        jobs = [
+            job.to_schema(JobSchema)
+            for job in prefetch_schema(
+                Job.select().order_by(-Job.created_on).limit(limit), JobSchema
+            )
+        ]
+    return jobs, counter.count
+
+
+def test_job_page_query_count_is_constant(memory_db):
+    add_jobs(12)
+    small, small_count = render_jobs(2)
+    large, large_count = render_jobs(12)
+    assert len(small) == 2 and len(large) == 12
+    assert small_count == large_count
+
+
+def test_prefetched_job_matches_lazy(memory_db):
+    add_jobs(3)
+    lazy = {job.id: job.to_schema(JobSchema) for job in Job.select()}
+    prefetched, _ = render_jobs(3)
+    for job in prefetched:
+        assert job == lazy[job.id]
+
+
+def test_guide_roadmap_is_ordered(memory_db):
+    add_jobs(1)
+    guide = Guide.get()
+    for index in (2, 0, 1):
+        Course.create(
+            slug=f"c{index}", title="-", description="-", link="-", skill=f"s{index}"
+        )
+        SkillTimeline.create(
+            title=f"step {index}",
+            description="-",
+            guide=guide,
+            skill=Skill.get_by_id(f"s{index}"),
+            index=index,
+        )
+    (prefetched,) = prefetch_schema(Guide.select(), GuideSchema)
+    schema = prefetched.to_schema(GuideSchema)
+    assert [step.index for step in schema.roadmap] == [0, 1, 2]
+    assert schema == guide.to_schema(GuideSchema)
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from app.database import create_database
+from app.models.dbmodel import *
+from app.quota import REQUEST_QUOTA
+from app.routers.jobrequest import create_request
+from tests.conftest import add_jobs
+from datetime import datetime, timedelta
+
+
+def add_seeker() -> User:
+    seeker = Seeker.create(firstname="name", lastname="family")
+    return User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seeker,
+    )
+
+
+def status_of(job_id, user):
+    try:
+        create_request(job_id, user)
+        return 200
+    except HTTPException as e:
+        return e.status_code
+
+
+def test_request_quota(memory_db):
+    add_jobs(REQUEST_QUOTA + 2)
+    user = add_seeker()
+    assert status_of(1, user) == 200
+    assert status_of(1, user) == 409
+    assert [status_of(id, user) for id in range(2, REQUEST_QUOTA + 2)] == [200] * (
+        REQUEST_QUOTA - 1
+    ) + [429]
+    # refused requests are rolled back whole
+    assert JobRequest.select().count() == REQUEST_QUOTA
+    assert sum(job.requests_count for job in Job.select()) == REQUEST_QUOTA
+    assert Seeker.get().req_lim_count == REQUEST_QUOTA
+
+    Seeker.update(req_lim_date=datetime.now() - timedelta(days=2)).execute()
+    assert status_of(REQUEST_QUOTA + 1, user) == 200
+    assert Seeker.get().req_lim_count == 1
+    Job.update(expire_on=datetime.now()).where(Job.id == REQUEST_QUOTA + 2).execute()
+    assert status_of(REQUEST_QUOTA + 2, user) == 400
+
+
+def test_concurrent_requests(tmp_path):
+    db = create_database(f"sqlite:///{tmp_path}/quota.sqlite")
+    database_proxy.initialize(db)
+    db.create_tables(TABLES)
+    add_jobs(REQUEST_QUOTA * 2)
+    user = add_seeker()
+    # every job twice, from 8 connections at once
+    job_ids = list(range(1, REQUEST_QUOTA * 2 + 1)) * 2
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(lambda id: status_of(id, user), job_ids))
+    assert statuses.count(200) == REQUEST_QUOTA
+    assert JobRequest.select().count() == REQUEST_QUOTA
+    assert sum(job.requests_count for job in Job.select()) == REQUEST_QUOTA
+    db.close()
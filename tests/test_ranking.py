@@ -0,0 +1,67 @@
+import pytest
+from fastapi import HTTPException
+
+from app.database import QueryCounter
+from app.models.dbmodel import *
+from app.ranking import ranking
+from app.routers.jobrequest import ranked_requests_page
+from tests.conftest import add_jobs
+
+
+def applicant(job: Job, i: int, skills: dict[str, int]) -> Seeker:
+    seeker = Seeker.create(firstname=f"seeker {i}", lastname="-")
+    for skill, score in skills.items():
+        SeekerSkill.create(seeker=seeker, skill=skill, score=score)
+    JobRequest.create(job=job, seeker=seeker)
+    return seeker
+
+
+def test_ranked_requests(memory_db):
+    add_jobs(2)  # job 2 asks for s0 and s1
+    job = Job.get_by_id(2)
+    employer = User.get(User.employer == job.employer_id)
+    exam = Exam.create(title="-", exam_type=ExamTypes.skill, skill="s1")
+    first = applicant(job, 1, {"s0": 80})
+    second = applicant(job, 2, {"s0": 40, "s1": 40})
+    third = applicant(job, 3, {"s2": 100})
+
+    # (0.5 * 80 + 0.3 * 0) / 2 = 20, same as the second; newest first on ties
+    assert ranking(2) == (job.employer_id, ((2, 20), (1, 20), (3, 0)))
+
+    with QueryCounter() as queries:
+        ranking(2)
+    assert queries.count == 0
+
+    ExamResult.create(exam=exam, seeker=third, data={}, score=50)
+    ExamResult.create(exam=exam, seeker=first, data={}, score=30)
+    ExamResult.create(exam=exam, seeker=first, data={}, score=100)
+    personality = Personality.create(slug="INTJ", test="-", model="-")
+    personality.job_categories.add(JobCategory.get_by_id("web"))
+    second.personalities.add(personality)
+    assert [score for _, score in ranking(2)[1]] == [40, 35, 7.5]
+
+    applicant(job, 4, {})
+    assert ranking(2)[1][-1] == (4, 0)
+
+    first_job = Job.get_by_id(1)
+    owner = User.get(User.employer == first_job.employer_id)
+    with pytest.raises(HTTPException) as e:
+        ranked_requests_page(owner, 1, 1, 10)
+    assert e.value.status_code == 204
+    for i in range(3):
+        applicant(first_job, 5 + i, {})
+    # job 1 asks for s0 only
+    s0 = Exam.create(title="-", exam_type=ExamTypes.skill, skill="s0")
+    ExamResult.create(exam=s0, seeker=6, data={}, score=100)
+    page = ranked_requests_page(owner, 1, 1, 2)
+    assert [(r.id, r.score) for r in page.requests] == [(6, 30), (7, 0)]
+    assert page.meta.total_count == 3 and page.meta.page_count == 2
+    for user, job_id, code in (
+        (employer, 1, 404),
+        (owner, 99, 404),
+        (owner, None, 400),
+        (owner, 1, 400),
+    ):
+        with pytest.raises(HTTPException) as e:
+            ranked_requests_page(user, job_id, 3, 2)
+        assert e.value.status_code == code
@@ -0,0 +1,67 @@
+from random import Random
+
+import pytest
+
+from app import facets, recommend
+from app.facets import FacetIndex, bitmap
+from app.models.dbmodel import *
+from app.recommend import add_weighted, set_bits, top_k
+from app.routers.me import recommended_jobs
+from tests.conftest import add_jobs
+
+
+def test_top_k_matches_sorting():
+    rng = Random(7)
+    for _ in range(20):
+        jobs = range(1, 300)
+        slices, candidates = [], 0
+        scores = dict.fromkeys(jobs, 0)
+        for _ in range(rng.randint(1, 10)):
+            ids = rng.sample(jobs, rng.randint(1, 150))
+            weight = rng.randint(1, 9)
+            add_weighted(slices, bitmap(ids), weight)
+            candidates |= bitmap(ids)
+            for id in ids:
+                scores[id] += weight
+        k = rng.randint(1, 60)
+        best = sorted((id for id in jobs if scores[id]), key=lambda i: (-scores[i], -i))
+        assert sorted(set_bits(top_k(slices, candidates, k))) == sorted(best[:k])
+
+
+@pytest.fixture()
+def index(memory_db, monkeypatch):
+    index = FacetIndex()
+    monkeypatch.setattr(facets, "facet_index", index)
+    monkeypatch.setattr(recommend, "facet_index", index)
+    return index
+
+
+def test_recommended_jobs(index):
+    add_jobs(4)  # skills: job 1 -> s0, job 2 -> s0 s1, job 3 -> s0 s1 s2, ...
+    index.rebuild()
+    seeker = Seeker.create(firstname="-", lastname="-")
+    user = User.create(
+        email="s@example.com",
+        phone_number="09130000000",
+        pass_hash="-",
+        role=Role.seeker,
+        seeker=seeker,
+    )
+    SeekerSkill.create(seeker=seeker, skill="s1", score=100)
+    SeekerSkill.create(seeker=seeker, skill="s2", score=0)
+
+    page = recommended_jobs(user)
+    # s1 weighs 8, s2 1; job 4 has s0 only and ties with job 1 at 0
+    assert [(j.job["id"], j.score) for j in page.jobs] == [(3, 9), (2, 8)]
+
+    personality = Personality.create(slug="INTJ", test="-", model="-")
+    personality.job_categories.add(JobCategory.get_by_id("web"))
+    seeker.personalities.add(personality)
+    Job.get_by_id(1).skills.add(Skill.get_by_id("s2"))
+    page = recommended_jobs(user)
+    assert [(j.job["id"], j.score) for j in page.jobs] == [
+        (3, 13),
+        (2, 12),
+        (1, 5),
+        (4, 4),
+    ]
@@ -0,0 +1,52 @@
+from app.models.dbmodel import *
+from app.routers.jobs import search_page
+from app.search import match_expression, normalize, rebuild_index
+from app.tasks import expire_jobs
+from tests.conftest import add_jobs
+from datetime import datetime, timedelta
+
+
+def test_normalize():
+    assert normalize("كتاب‌خواني ۱۲٣") == "کتاب خوانی 123"
+    assert match_expression("برنامه‌نويس") == '"برنامه" "نویس"*'
+    assert match_expression("  ؟! ") is None
+
+
+def test_search_jobs(memory_db):
+    add_jobs(3)
+    job = Job.get_by_id(2)
+    job.title = "برنامه‌نويس پايتون"
+    job.save()
+    page = search_page("برنامه نویس", 1, 10)
+    assert [j.id for j in page.jobs] == [2] and page.meta.total_count == 1
+    # prefix match on the last term
+    assert search_page("پایت", 1, 10).jobs[0].id == 2
+    job.delete_instance()
+    assert JobIndex.select().where(JobIndex.rowid == 2).count() == 0
+
+
+def test_sweep_unindexes_expired_jobs(memory_db):
+    add_jobs(3)
+    for job in Job.select():
+        job.save()
+    Job.update(expire_on=datetime.now() - timedelta(hours=1)).where(
+        Job.id == 1
+    ).execute()
+    expire_jobs()
+    assert sorted(r.rowid for r in JobIndex.select(JobIndex.rowid)) == [2, 3]
+
+
+def test_rebuild_index(memory_db):
+    add_jobs(4)
+    JobIndex.delete().execute()
+    assert rebuild_index(batch_size=3) == 4
+    assert search_page("skill 2", 1, 10).meta.total_count == 1
+
+
+def test_skill_changes_reindex(memory_db):
+    add_jobs(2)  # job 1 -> s0, job 2 -> s0 s1
+    assert search_page("skill 1", 1, 10).meta.total_count == 1
+    Job.get_by_id(1).skills.add(Skill.get_by_id("s1"))
+    assert search_page("skill 1", 1, 10).meta.total_count == 2
+    Skill.get_by_id("s2").jobs.add(Job.get_by_id(2))
+    assert search_page("skill 2", 1, 10).meta.total_count == 1
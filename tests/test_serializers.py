@@ -0,0 +1,27 @@
+from app.models.dbmodel import *
+from app.models.schemas import JobSchema
+from app.models.serializers import dumps, serialize
+from fastapi.encoders import jsonable_encoder
+import json
+from tests.conftest import add_jobs
+
+
+def test_serialize_matches_validation(memory_db):
+    add_jobs(2)
+    job = Job.get_by_id(1)
+    result = serialize(job, JobSchema)
+    # same values a validating constructor yields, e.g. employer id as str
+    assert result == JobSchema.parse_obj(result.dict())
+    assert result.employer.id == str(job.employer.id)
+    JobSkillThrough = Job.skills.get_through_model()
+    JobSkillThrough.delete().where(JobSkillThrough.job == job).execute()
+    assert job.to_schema(JobSchema).skills == []
+
+
+def test_dumps_matches_fastapi_encoding(memory_db):
+    add_jobs(3)
+    job = Job.get_by_id(2).to_schema(JobSchema)
+    expected = json.dumps(
+        jsonable_encoder(job), ensure_ascii=False, separators=(",", ":")
+    )
+    assert dumps(job) == expected.encode()
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from app.models.dbmodel import *
+from app.routers.category import category_jobs_page
+from app.routers.jobs import job_detail, jobs_page, search_page
+from app.tasks import expire_rows
+from tests.conftest import add_jobs
+from datetime import datetime, timedelta
+
+
+def test_expire_rows_in_batches(memory_db):
+    add_jobs(7)
+    now = datetime.now()
+    Job.update(expire_on=now - timedelta(hours=1)).where(Job.id <= 5).execute()
+    assert expire_rows(Job, now, batch_size=2) == 5
+    assert Job.select().where(Job.expired == True).count() == 5
+    # already expired rows are not touched again
+    assert expire_rows(Job, now, batch_size=2) == 0
+
+
+def test_listings_drop_expired_jobs_before_the_sweep(memory_db):
+    add_jobs(3)
+    assert jobs_page(1, 10, None, False).meta.total_count == 3
+    # time passes: bare updates send no signals, so nothing is swept or
+    # re-rendered and `expired` is still unset
+    past = datetime.now() - timedelta(minutes=1)
+    Job.update(expire_on=past).where(Job.id == 1).execute()
+    JobListing.update(expire_on=past).where(JobListing.job == 1).execute()
+
+    assert not Job.get_by_id(1).expired
+    assert [j["id"] for j in jobs_page(1, 10, None, False).jobs] == [3, 2]
+    assert category_jobs_page("web", 1, 10, None, False).meta.total_count == 2
+    assert sorted(j.id for j in search_page("job", 1, 10).jobs) == [2, 3]
+    with pytest.raises(HTTPException) as e:
+        job_detail(1)
+    assert e.value.status_code == 404
+    assert job_detail(2).id == 2
+    # the listings' range scan
+    assert ["expire_on", "created_on"] in [
+        index.columns for index in memory_db.get_indexes("job")
+    ]